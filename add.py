@@ -1,12 +1,35 @@
 # -*- coding: utf-8 -*-
+import codecs
 import datetime
+import email.utils
+import hashlib
+import json
 import logging
+import random
+import sqlite3
+import threading
 import time
-from typing import Any, Dict, Optional, Set, Tuple
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import requests
-from bs4 import BeautifulSoup
 
+import http_pool
+from config_service import get_config
+from resilience import CircuitBreaker, SingleFlight, TokenBucket
+from extractor import (
+    LOGIN_ERRORS,
+    REQUIRED_LABELS,
+    VpsInfoExtractor,
+    configure_parse_pool,
+    extract_vps_info,
+    extract_vps_info_pooled,
+    parse_pool_size,
+    section_fingerprint,
+)
+from events import EventLog
+from scheduler import CheckScheduler, ReminderScheduler
 from sql import *
 from send import *
 
@@ -26,23 +49,51 @@ STATE_PENDING = 2
 REQUEST_TIMEOUT = 15
 REQUEST_MAX_ATTEMPTS = 3
 REQUEST_RETRY_DELAY = 2
+REQUEST_RETRY_MAX_DELAY = 30
+STREAM_CHUNK_SIZE = 8192
+MAX_RESPONSE_BYTES = 1024 * 1024
 INITIAL_WARMUP_SECONDS = 3
 
 NEW_ENTRY_FAILURE_THRESHOLD = 3
 EXISTING_FAILURE_THRESHOLD = 2
 
-REQUIRED_LABELS = (
-    'VPS Creation Date',
-    'Valid until',
-    'IPv6',
-    'Location',
-    'Total disk space',
-    'Ram',
+CHECK_MAX_WORKERS = 8
+PROVIDER_MAX_INFLIGHT = 4
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_OPEN_SECONDS = 60
+BREAKER_HALF_OPEN_PROBES = 2
+
+PROVIDER_RATE = 2.0
+PROVIDER_BURST = 5
+RATE_LIMIT_MAX_WAIT = 5
+RETRY_AFTER_MAX_SECONDS = 600
+
+FETCH_COALESCE_TTL = 5
+
+PARSE_POOL_WORKERS = 0
+PARSE_POOL_MIN_BATCH = 50
+
+PENDING_CHECK_INTERVAL = 10
+FAILING_CHECK_INTERVAL = 15
+ABNORMAL_CHECK_INTERVAL = 60
+UNKNOWN_EXPIRY_CHECK_INTERVAL = 600
+NORMAL_MAX_CHECK_INTERVAL = 1800
+QUARANTINE_PROBE_INTERVAL = 3600
+CHECK_INTERVAL_JITTER = 0.1
+# (time left until expiry, seconds between checks), tightest first
+EXPIRY_CHECK_TIERS = (
+    (datetime.timedelta(hours=1), 30),
+    (datetime.timedelta(hours=6), 60),
+    (datetime.timedelta(days=1), 300),
+    (datetime.timedelta(days=2), 600),
 )
-ESSENTIAL_KEYS = ('VPS Creation Date', 'Valid until')
+# 每隔多少秒在日志中输出一次检测耗时与限速统计, 填 0 关闭
+METRICS_LOG_INTERVAL = 600
 
 PROVIDER_CONFIGS = {
     'hax': {
+        'key': 'hax',
         'label': 'Hax',
         'url': 'https://hax.co.id/vps-info/',
         'headers': {
@@ -51,6 +102,7 @@ PROVIDER_CONFIGS = {
         'cookie_header': 'Cookie',
     },
     'woiden': {
+        'key': 'woiden',
         'label': 'Woiden',
         'url': 'https://woiden.id/vps-info/',
         'headers': {
@@ -59,6 +111,7 @@ PROVIDER_CONFIGS = {
         'cookie_header': 'Cookie',
     },
     'vc': {
+        'key': 'vc',
         'label': 'VC',
         'url': 'https://free.vps.vc/vps-info',
         'headers': {
@@ -77,11 +130,79 @@ RENEWAL_URLS = {
 
 TWO_DAY_THRESHOLD = datetime.timedelta(days=2)
 HOURLY_REMINDER_INTERVAL = datetime.timedelta(hours=1)
+# Telegram/邮件到期提醒窗口; 间隔与 send.tg 的限频一致
+MESSAGE_REMINDER_WINDOW = datetime.timedelta(days=3)
+MESSAGE_REMINDER_INTERVAL = TG_SEND_INTERVAL
 
 _expiry_reminder_state: Dict[int, Dict[str, Any]] = {}
+_reminder_scheduler = ReminderScheduler()
+# vps_id -> (expiry_iso, expiry_dt, expiry_display) the timers were built for
+_reminder_plans: Dict[int, Tuple[Optional[str], Optional[datetime.datetime], str]] = {}
+_reminder_rows: Dict[int, Any] = {}
+_reminder_data_version: Optional[int] = None
+
+CHECKER_CONFIG_SECTIONS = ('http', 'database', 'checker')
+_checker_settings: Optional[Dict[str, Any]] = None
 
 _status_tracker: Dict[int, Dict[str, Any]] = {}
 
+_check_scheduler = CheckScheduler()
+_check_wakeup = threading.Event()
+
+_fetch_settings: Dict[str, Any] = {
+    'stream_fetch': True,
+    'max_response_bytes': MAX_RESPONSE_BYTES,
+    'breaker_failure_threshold': BREAKER_FAILURE_THRESHOLD,
+    'breaker_open_seconds': BREAKER_OPEN_SECONDS,
+    'breaker_half_open_probes': BREAKER_HALF_OPEN_PROBES,
+    'provider_rates': {},
+    'parse_pool_min_batch': PARSE_POOL_MIN_BATCH,
+    'use_parse_pool': False,
+}
+
+_breakers_lock = threading.Lock()
+_provider_breakers: Dict[str, CircuitBreaker] = {}
+_provider_limiters: Dict[str, TokenBucket] = {}
+
+_fetch_flight = SingleFlight(ttl=FETCH_COALESCE_TTL)
+
+_check_executor: Optional[ThreadPoolExecutor] = None
+_check_executor_size = 0
+_check_metrics_lock = threading.Lock()
+_check_metrics: Dict[str, Any] = {
+    'cycles': 0,
+    'last_cycle_started_at': None,
+    'last_cycle_seconds': None,
+    'max_cycle_seconds': None,
+    'avg_cycle_seconds': None,
+    'last_cycle_checked': 0,
+    'retries_scheduled': 0,
+    'provider_inflight_peak': {},
+}
+_metrics_logged_at: Optional[float] = None
+
+_dashboard_lock = threading.Lock()
+_dashboard_snapshot: Optional[Tuple[int, Dict[str, Any], str]] = None
+
+_event_log = EventLog()
+_published_lock = threading.Lock()
+_published_dashboard: Dict[str, Any] = {'version': None, 'rows': {}}
+_announced_notification_ids: Set[int] = set()
+
+
+class ResponseTooLargeError(requests.RequestException):
+    pass
+
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+
+class RateLimitDeferredError(requests.RequestException):
+    def __init__(self, *args, delay: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+
 
 def _now_utc() -> datetime.datetime:
     return datetime.datetime.now(datetime.timezone.utc)
@@ -98,6 +219,10 @@ def _ensure_tracker(vps_id: int, initial_state: Optional[int] = None) -> Dict[st
             'first_seen_at': _now_utc(),
             'last_error': None,
             'last_checked_at': None,
+            'info_fingerprint': None,
+            'section_fingerprint': None,
+            'retry_attempt': 0,
+            'quarantine': None,
         }
         _status_tracker[vps_id] = entry
     elif entry.get('last_applied_state') is None and initial_state is not None:
@@ -370,43 +495,210 @@ def _build_headers(config: Dict[str, Any], vps) -> Dict[str, str]:
     return headers
 
 
-def _fetch_provider_page(url: str, headers: Dict[str, str], provider_label: str) -> str:
-    last_error: Optional[Exception] = None
-    for attempt in range(1, REQUEST_MAX_ATTEMPTS + 1):
+def _get_breaker(provider_key: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _provider_breakers.get(provider_key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider_key,
+                failure_threshold=_fetch_settings['breaker_failure_threshold'],
+                open_seconds=_fetch_settings['breaker_open_seconds'],
+                half_open_probes=_fetch_settings['breaker_half_open_probes'],
+            )
+            _provider_breakers[provider_key] = breaker
+        return breaker
+
+
+def _get_limiter(provider_key: str) -> TokenBucket:
+    with _breakers_lock:
+        limiter = _provider_limiters.get(provider_key)
+        if limiter is None:
+            rate, burst = _fetch_settings['provider_rates'].get(provider_key, (PROVIDER_RATE, PROVIDER_BURST))
+            limiter = TokenBucket(provider_key, rate, burst)
+            _provider_limiters[provider_key] = limiter
+        return limiter
+
+
+def _retry_after_seconds(response) -> Optional[float]:
+    raw = response.headers.get('Retry-After') if response is not None else None
+    if not raw:
+        return None
+    raw = raw.strip()
+    if raw.isdigit():
+        seconds = float(raw)
+    else:
         try:
-            response = requests.get(url=url, headers=headers, timeout=REQUEST_TIMEOUT)
+            retry_at = email.utils.parsedate_to_datetime(raw)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+        seconds = (retry_at - _now_utc()).total_seconds()
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX_SECONDS)
+
+
+def _is_provider_failure(exc: requests.RequestException) -> bool:
+    """Whether a request error says the provider itself is unhealthy.
+
+    Connection errors, timeouts, 5xx and 429 count against the breaker;
+    other HTTP errors mean the provider answered and are left to the
+    per-VPS debounce.
+    """
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return True
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def _request_once(provider_label: str, provider_key: Optional[str], perform):
+    key = provider_key or provider_label.lower()
+    session = http_pool.get_session(key)
+    breaker = _get_breaker(key)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f'{provider_label} circuit is open after repeated provider failures, request skipped')
+    limiter = _get_limiter(key)
+    if limiter.acquire(RATE_LIMIT_MAX_WAIT) is None:
+        breaker.release()
+        raise RateLimitDeferredError(f'{provider_label} request rate limit reached', delay=limiter.delay_hint())
+    try:
+        result = perform(session)
+    except ResponseTooLargeError:
+        breaker.record_success()
+        raise
+    except requests.RequestException as exc:
+        response = getattr(exc, 'response', None)
+        if response is not None and response.status_code in (429, 503):
+            limiter.penalize(_retry_after_seconds(response))
+        if _is_provider_failure(exc):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except Exception:
+        breaker.release()
+        raise
+    breaker.record_success()
+    limiter.reward()
+    return result
+
+
+def _fetch_provider_page(url: str, headers: Dict[str, str], provider_label: str, provider_key: Optional[str] = None) -> str:
+    def perform(session):
+        response = session.get(url=url, headers=headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+
+    return _request_once(provider_label, provider_key, perform)
+
+
+def _drain_response(response, received: int, max_bytes: int):
+    # reading the body to the end lets urllib3 return the socket to the pool;
+    # only a body past the size cap is cut off with its connection
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        received += len(chunk)
+        if received > max_bytes:
+            return
+
+
+def _stream_vps_info(response, max_bytes: int) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ResponseTooLargeError(f'response body of {content_length} bytes exceeds the {max_bytes} byte limit')
+    try:
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        # unknown charset: decode leniently as utf-8, like response.text would
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    extractor = VpsInfoExtractor()
+    received = 0
+    has_content = False
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ResponseTooLargeError(f'response body exceeded the {max_bytes} byte limit')
+        text = decoder.decode(chunk)
+        if not has_content and text.strip():
+            has_content = True
+        extractor.feed(text)
+        if extractor.complete:
+            result = extractor.result()
+            _drain_response(response, received, max_bytes)
+            return result
+    tail = decoder.decode(b'', final=True)
+    if tail.strip():
+        has_content = True
+    extractor.feed(tail)
+    if not has_content:
+        return None, 'empty response body'
+    extractor.close()
+    return extractor.result()
+
+
+def _fetch_provider_info(
+    url: str,
+    headers: Dict[str, str],
+    provider_label: str,
+    provider_key: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """Streaming variant of ``_fetch_provider_page`` + ``_parse_vps_info``.
+
+    Chunks are fed to the extractor as they arrive and parsing stops as
+    soon as the VPS fields have been read; the rest of the body is still
+    read (not parsed) so the keep-alive connection is reused. Bodies larger than
+    ``max_response_bytes`` raise ``ResponseTooLargeError``, which is never
+    retried.
+    """
+    max_bytes = _fetch_settings['max_response_bytes']
+
+    def perform(session):
+        with session.get(url=url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
             response.raise_for_status()
-            return response.text
-        except requests.RequestException as exc:
-            last_error = exc
-            logger.warning('[%s] Request attempt %s failed: %s', provider_label, attempt, exc)
-            if attempt < REQUEST_MAX_ATTEMPTS:
-                time.sleep(REQUEST_RETRY_DELAY)
-    if last_error:
-        raise last_error
-    raise RuntimeError('Unexpected request failure')
+            return _stream_vps_info(response, max_bytes)
+
+    return _request_once(provider_label, provider_key, perform)
+
+
+class _FetchedPage:
+    """One provider response, shared by every VPS row using the same cookie."""
+
+    __slots__ = ('html', 'section', '_parsed', '_lock')
+
+    def __init__(self, html: Optional[str] = None, section: Optional[str] = None, parsed=None):
+        self.html = html
+        self.section = section
+        self._parsed = parsed
+        self._lock = threading.Lock()
+
+    def parse(self) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+        with self._lock:
+            if self._parsed is None:
+                if _fetch_settings['use_parse_pool']:
+                    self._parsed = extract_vps_info_pooled(self.html)
+                else:
+                    self._parsed = _parse_vps_info(self.html)
+            return self._parsed
+
+
+def _fetch_page(config: Dict[str, Any], headers: Dict[str, str]) -> _FetchedPage:
+    provider_label = config['label']
+    if _fetch_settings['stream_fetch']:
+        return _FetchedPage(parsed=_fetch_provider_info(config['url'], headers, provider_label, config.get('key')))
+    html = _fetch_provider_page(config['url'], headers, provider_label, config.get('key'))
+    section = section_fingerprint(html) if html and html.strip() else None
+    return _FetchedPage(html=html or '', section=section)
+
+
+def _fetch_page_coalesced(config: Dict[str, Any], vps) -> _FetchedPage:
+    """Fetch the vps-info page once per (provider, cookie) for every row
+    that shares the account, within a cycle or ``coalesce_ttl`` seconds."""
+    headers = _build_headers(config, vps)
+    cookie_digest = hashlib.sha1(str(vps['cookie'] or '').encode('utf-8')).hexdigest()
+    key = (config.get('key') or config['label'], cookie_digest)
+    return _fetch_flight.do(key, lambda: _fetch_page(config, headers))
 
 
 def _parse_vps_info(html: str) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
-    soup = BeautifulSoup(html, 'html.parser')
-    if soup is None:
-        return None, 'unable to parse response'
-    keys = soup.find_all('label', {'class': 'col-sm-5 col-form-label'})
-    values = soup.find_all('div', {'class': 'col-sm-7'})
-    info: Dict[str, str] = {}
-    for key_el, value_el in zip(keys, values):
-        label = key_el.get_text(strip=True)
-        if label in REQUIRED_LABELS:
-            info[label] = value_el.get_text(strip=True)
-    has_required = all(info.get(field) for field in ESSENTIAL_KEYS)
-    if has_required:
-        return info, None
-    html_lower = html.lower()
-    if soup.find('form', {'id': 'loginform'}) or 'loginform' in html_lower:
-        return None, 'login form detected, cookie may be expired'
-    if soup.find('input', {'name': 'log'}) or soup.find('input', {'name': 'pwd'}):
-        return None, 'authentication page detected'
-    return None, 'required VPS fields missing'
+    return extract_vps_info(html)
 
 
 def _mark_success(vps_id: int, provider_label: str, entry: Dict[str, Any]):
@@ -422,9 +714,35 @@ def _mark_success(vps_id: int, provider_label: str, entry: Dict[str, Any]):
         logger.debug('[%s] VPS %s check succeeded (state unchanged)', provider_label, vps_id)
 
 
-def _persist_success(vps, config: Dict[str, Any], entry: Dict[str, Any], info: Dict[str, str]):
+def _info_fingerprint(info: Dict[str, str]) -> str:
+    fields = [info.get(label) or '' for label in REQUIRED_LABELS]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _forget_fingerprints(entry: Dict[str, Any]):
+    entry['info_fingerprint'] = None
+    entry['section_fingerprint'] = None
+
+
+def _persist_unchanged(vps, config: Dict[str, Any], entry: Dict[str, Any]):
     vps_id = vps['id']
     provider_label = config['label']
+    try:
+        buffer_touch(vps_id)
+    except Exception as exc:
+        logger.exception('[%s] Failed to refresh check time for VPS %s: %s', provider_label, vps_id, exc)
+        _forget_fingerprints(entry)
+    _mark_success(vps_id, provider_label, entry)
+
+
+def _persist_success(vps, config: Dict[str, Any], entry: Dict[str, Any], info: Dict[str, str], section: Optional[str] = None):
+    vps_id = vps['id']
+    provider_label = config['label']
+    fingerprint = _info_fingerprint(info)
+    if fingerprint == entry.get('info_fingerprint'):
+        entry['section_fingerprint'] = section
+        _persist_unchanged(vps, config, entry)
+        return
     creation_date = info.get('VPS Creation Date') or ''
     valid_until = info.get('Valid until') or ''
     location = info.get('Location') or ''
@@ -432,13 +750,17 @@ def _persist_success(vps, config: Dict[str, Any], entry: Dict[str, Any], info: D
     ram = info.get('Ram') or ''
     disk_total = info.get('Total disk space') or ''
     try:
-        updateInfoSql(creation_date, valid_until, location, ipv6, ram, disk_total, vps_id)
+        buffer_info_update(creation_date, valid_until, location, ipv6, ram, disk_total, vps_id, vps['ops'])
     except Exception as exc:
         logger.exception('[%s] Failed to persist info for VPS %s: %s', provider_label, vps_id, exc)
+        _forget_fingerprints(entry)
         try:
-            updateState(STATE_NORMAL, vps_id)
+            buffer_state(STATE_NORMAL, vps_id)
         except Exception:
             logger.exception('[%s] Failed to set VPS %s state to normal after persistence error', provider_label, vps_id)
+    else:
+        entry['info_fingerprint'] = fingerprint
+        entry['section_fingerprint'] = section
     _mark_success(vps_id, provider_label, entry)
 
 
@@ -458,7 +780,7 @@ def _record_failure(vps, config: Dict[str, Any], entry: Dict[str, Any], reason:
         logger.debug('[%s] VPS %s remains abnormal (%s)', provider_label, vps_id, reason)
         return
     try:
-        updateState(STATE_ABNORMAL, vps_id)
+        buffer_state(STATE_ABNORMAL, vps_id)
     except Exception as exc:
         logger.exception('[%s] Failed to mark VPS %s as abnormal: %s', provider_label, vps_id, exc)
         return
@@ -466,40 +788,418 @@ def _record_failure(vps, config: Dict[str, Any], entry: Dict[str, Any], reason:
     logger.warning('[%s] VPS %s marked as abnormal after %s consecutive failures: %s', provider_label, vps_id, attempts, reason)
 
 
+def _retry_delay(attempt: int) -> float:
+    delay = min(REQUEST_RETRY_MAX_DELAY, REQUEST_RETRY_DELAY * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _handle_request_error(vps, config: Dict[str, Any], entry: Dict[str, Any], exc: requests.RequestException):
+    """Re-enqueue a failed attempt with backoff or, once the attempt budget
+    is spent, hand the failure to the debounce in ``_record_failure``."""
+    vps_id = vps['id']
+    if isinstance(exc, RateLimitDeferredError):
+        _check_scheduler.schedule(vps_id, time.monotonic() + max(exc.delay, 0.5))
+        logger.debug('[%s] VPS %s deferred by rate limit for %.1fs', config['label'], vps_id, exc.delay)
+        return
+    attempt = entry.get('retry_attempt', 0) + 1
+    retryable = not isinstance(exc, (CircuitOpenError, ResponseTooLargeError))
+    if retryable and attempt < REQUEST_MAX_ATTEMPTS:
+        entry['retry_attempt'] = attempt
+        delay = _retry_delay(attempt)
+        _check_scheduler.schedule(vps_id, time.monotonic() + delay)
+        with _check_metrics_lock:
+            _check_metrics['retries_scheduled'] += 1
+        logger.warning('[%s] Request attempt %s for VPS %s failed: %s (retry in %.1fs)', config['label'], attempt, vps_id, exc, delay)
+        return
+    entry['retry_attempt'] = 0
+    _record_failure(vps, config, entry, f'{exc.__class__.__name__}: {exc}')
+
+
+def _cookie_fingerprint(cookie) -> str:
+    return hashlib.sha1(str(cookie or '').encode('utf-8')).hexdigest()
+
+
+def _quarantine_if_logged_out(vps, config: Dict[str, Any], entry: Dict[str, Any], error: Optional[str]):
+    """Stop polling a VPS whose cookie has been rejected until it changes.
+
+    Only applied once the failure has passed the debounce and the VPS is
+    marked abnormal; after that it is probed every
+    ``QUARANTINE_PROBE_INTERVAL`` seconds instead of on the failing cadence.
+    """
+    if error not in LOGIN_ERRORS or entry.get('quarantine'):
+        return
+    if entry.get('last_applied_state') != STATE_ABNORMAL:
+        return
+    entry['quarantine'] = {
+        'cookie': _cookie_fingerprint(vps['cookie']),
+        'since': _now_utc(),
+        'reason': error,
+    }
+    _forget_fingerprints(entry)
+    logger.warning('[%s] VPS %s cookie rejected (%s); polling paused until the cookie changes', config['label'], vps['id'], error)
+
+
+def _lift_quarantine(vps_id: int, entry: Dict[str, Any], reason: str):
+    if not entry.get('quarantine'):
+        return
+    entry['quarantine'] = None
+    entry['consecutive_failures'] = 0
+    entry['retry_attempt'] = 0
+    _forget_fingerprints(entry)
+    logger.info('VPS %s released from cookie quarantine (%s)', vps_id, reason)
+
+
 def _check_single_vps(vps, config: Dict[str, Any], entry: Dict[str, Any]):
     vps_id = vps['id']
     provider_label = config['label']
     warmup_remaining = _should_skip_initial_warmup(vps, entry)
     if warmup_remaining > 0:
         logger.debug('[%s] VPS %s warmup in progress (%.1fs remaining)', provider_label, vps_id, warmup_remaining)
+        _check_scheduler.schedule(vps_id, time.monotonic() + warmup_remaining)
         return
-    headers = _build_headers(config, vps)
     try:
-        html = _fetch_provider_page(config['url'], headers, provider_label)
+        page = _fetch_page_coalesced(config, vps)
     except requests.RequestException as exc:
-        _record_failure(vps, config, entry, f'{exc.__class__.__name__}: {exc}')
-        return
-    if not html or not html.strip():
-        _record_failure(vps, config, entry, 'empty response body')
+        _handle_request_error(vps, config, entry, exc)
         return
-    info, error = _parse_vps_info(html)
+    entry['retry_attempt'] = 0
+    if page.html is not None:
+        if not page.html.strip():
+            _record_failure(vps, config, entry, 'empty response body')
+            return
+        if page.section is not None and page.section == entry.get('section_fingerprint'):
+            _lift_quarantine(vps_id, entry, 'check succeeded')
+            _persist_unchanged(vps, config, entry)
+            return
+    info, error = page.parse()
     if info:
-        _persist_success(vps, config, entry, info)
+        _lift_quarantine(vps_id, entry, 'check succeeded')
+        _persist_success(vps, config, entry, info, page.section)
     else:
         _record_failure(vps, config, entry, error or 'unable to parse response')
+        _quarantine_if_logged_out(vps, config, entry, error)
+
+
+def _read_int_setting(section: Optional[Dict[str, str]], key: str, default: int) -> int:
+    if not section:
+        return default
+    raw = section.get(key)
+    if raw is None or str(raw).strip() == '':
+        return default
+    try:
+        value = int(str(raw).strip())
+    except (TypeError, ValueError):
+        logger.warning('Ignoring invalid [checker] %s value: %r', key, raw)
+        return default
+    return value if value > 0 else default
+
+
+def _read_float_setting(section: Optional[Dict[str, str]], key: str, default: float) -> float:
+    if not section:
+        return default
+    raw = section.get(key)
+    if raw is None or str(raw).strip() == '':
+        return default
+    try:
+        value = float(str(raw).strip())
+    except (TypeError, ValueError):
+        logger.warning('Ignoring invalid [checker] %s value: %r', key, raw)
+        return default
+    return value if value >= 0 else default
+
+
+def _read_bool_setting(section: Optional[Dict[str, str]], key: str, default: bool) -> bool:
+    if not section:
+        return default
+    raw = str(section.get(key) or '').strip().lower()
+    if raw in ('1', 'true', 'yes', 'on'):
+        return True
+    if raw in ('0', 'false', 'no', 'off'):
+        return False
+    return default
+
+
+def _on_config_change(changed: Set[str]):
+    global _checker_settings
+    if changed & set(CHECKER_CONFIG_SECTIONS):
+        _checker_settings = None
+
+
+get_config().subscribe(_on_config_change)
+
+
+def _current_checker_settings() -> Dict[str, Any]:
+    """Checker settings, re-read only after config.ini's checker sections changed."""
+    global _checker_settings
+    get_config().refresh()
+    settings = _checker_settings
+    if settings is None:
+        settings = _checker_settings = _load_checker_settings()
+    return settings
+
+
+def _load_checker_settings() -> Dict[str, Any]:
+    http_pool.configure(conf('http'))
+    configure_storage(conf('database'))
+    section = conf('checker')
+    _fetch_settings['stream_fetch'] = _read_bool_setting(section, 'stream_fetch', True)
+    _fetch_settings['max_response_bytes'] = _read_int_setting(section, 'max_response_bytes', MAX_RESPONSE_BYTES)
+    _fetch_flight.ttl = _read_float_setting(section, 'coalesce_ttl', FETCH_COALESCE_TTL)
+    parse_workers = _read_int_setting(section, 'parse_workers', PARSE_POOL_WORKERS)
+    if parse_workers > 0 and _fetch_settings['stream_fetch']:
+        # streamed pages are parsed while they download, so the pool would sit idle
+        logger.info('parse_workers = %s is ignored while stream_fetch is on', parse_workers)
+        parse_workers = 0
+    configure_parse_pool(parse_workers)
+    configure_write_buffer(
+        _read_int_setting(section, 'write_buffer_rows', WRITE_BUFFER_MAX_ROWS),
+        _read_float_setting(section, 'write_buffer_seconds', WRITE_BUFFER_MAX_AGE),
+    )
+    _fetch_settings['parse_pool_min_batch'] = _read_int_setting(section, 'parse_pool_min_batch', PARSE_POOL_MIN_BATCH)
+    _fetch_settings['breaker_failure_threshold'] = _read_int_setting(section, 'breaker_failure_threshold', BREAKER_FAILURE_THRESHOLD)
+    _fetch_settings['breaker_open_seconds'] = _read_int_setting(section, 'breaker_open_seconds', BREAKER_OPEN_SECONDS)
+    _fetch_settings['breaker_half_open_probes'] = _read_int_setting(section, 'breaker_half_open_probes', BREAKER_HALF_OPEN_PROBES)
+    default_rate = _read_float_setting(section, 'rate', PROVIDER_RATE)
+    default_burst = _read_int_setting(section, 'burst', PROVIDER_BURST)
+    _fetch_settings['provider_rates'] = {
+        provider_key: (
+            _read_float_setting(section, f'{provider_key}_rate', default_rate),
+            _read_int_setting(section, f'{provider_key}_burst', default_burst),
+        )
+        for provider_key in PROVIDER_CONFIGS
+    }
+    with _breakers_lock:
+        for breaker in _provider_breakers.values():
+            breaker.configure(
+                _fetch_settings['breaker_failure_threshold'],
+                _fetch_settings['breaker_open_seconds'],
+                _fetch_settings['breaker_half_open_probes'],
+            )
+        for provider_key, limiter in _provider_limiters.items():
+            rate, burst = _fetch_settings['provider_rates'].get(provider_key, (PROVIDER_RATE, PROVIDER_BURST))
+            limiter.configure(rate, burst)
+    limits = {}
+    default_limit = _read_int_setting(section, 'max_inflight', PROVIDER_MAX_INFLIGHT)
+    for provider_key, config in PROVIDER_CONFIGS.items():
+        fallback = config.get('max_inflight', default_limit)
+        limits[provider_key] = _read_int_setting(section, f'{provider_key}_max_inflight', fallback)
+    return {
+        'max_workers': _read_int_setting(section, 'max_workers', CHECK_MAX_WORKERS),
+        'provider_limits': limits,
+    }
+
+
+def _get_check_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _check_executor, _check_executor_size
+    if _check_executor is None or _check_executor_size != max_workers:
+        if _check_executor is not None:
+            _check_executor.shutdown(wait=False)
+        _check_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vps-check')
+        _check_executor_size = max_workers
+    return _check_executor
+
+
+def _run_check(vps, config: Dict[str, Any], entry: Dict[str, Any]):
+    try:
+        _check_single_vps(vps, config, entry)
+    except Exception as exc:
+        logger.exception('[%s] Unexpected error while checking VPS %s: %s', config['label'], vps['id'], exc)
+    finally:
+        entry['last_checked_at'] = _now_utc()
+        # a retry or an immediate check queued during the run takes precedence
+        if vps['id'] not in _check_scheduler:
+            _check_scheduler.schedule(vps['id'], time.monotonic() + _next_check_interval(vps, entry))
+
+
+def _next_check_interval(vps, entry: Dict[str, Any]) -> float:
+    """Seconds until a VPS should be checked again.
+
+    Failing, abnormal and pending VPS are polled at short fixed intervals;
+    healthy ones are polled more often the closer they are to expiry.
+    """
+    state = entry.get('last_applied_state')
+    if state is None:
+        state = vps['state']
+    if entry.get('quarantine'):
+        interval = QUARANTINE_PROBE_INTERVAL
+    elif entry.get('consecutive_failures'):
+        interval = ABNORMAL_CHECK_INTERVAL if state == STATE_ABNORMAL else FAILING_CHECK_INTERVAL
+    elif state == STATE_ABNORMAL:
+        interval = ABNORMAL_CHECK_INTERVAL
+    elif state == STATE_PENDING or _is_new_vps(vps, entry):
+        interval = PENDING_CHECK_INTERVAL
+    else:
+        expiry_dt, _, _ = resolve_expiry_values(vps['creation_date'], vps['valid_until'], vps['expiry_utc'], vps['ops'])
+        if expiry_dt is None:
+            interval = UNKNOWN_EXPIRY_CHECK_INTERVAL
+        else:
+            remaining = expiry_dt - _now_utc()
+            interval = NORMAL_MAX_CHECK_INTERVAL
+            if remaining > -datetime.timedelta(days=1):
+                for threshold, tier_interval in EXPIRY_CHECK_TIERS:
+                    if remaining <= threshold:
+                        interval = tier_interval
+                        break
+    return interval * random.uniform(1 - CHECK_INTERVAL_JITTER, 1)
+
+
+def next_check_delay() -> Optional[float]:
+    return _check_scheduler.seconds_until_next()
+
+
+def request_immediate_check(vps_id: int):
+    _check_scheduler.schedule(vps_id, time.monotonic())
+    _check_wakeup.set()
+
+
+def next_reminder_delay() -> Optional[float]:
+    return _reminder_scheduler.seconds_until_next()
+
+
+def wait_for_due_checks(max_wait: float):
+    """Block the checker loop until the next check or reminder deadline,
+    ``max_wait`` seconds or an explicit ``request_immediate_check``,
+    whichever comes first."""
+    delay = next_check_delay()
+    timeout = max_wait if delay is None else max(1, min(max_wait, delay))
+    reminder_delay = next_reminder_delay()
+    if reminder_delay is not None:
+        timeout = min(timeout, reminder_delay)
+    _check_wakeup.wait(timeout)
+    _check_wakeup.clear()
+
+
+def _dispatch_checks(jobs, settings: Dict[str, Any]):
+    """Run checks on the worker pool, capping in-flight requests per provider.
+
+    Each provider has its own queue and only ``provider_limits[key]`` of its
+    jobs are submitted at a time, so a slow provider never occupies workers
+    that could be serving another one.
+    """
+    queues: Dict[str, deque] = {}
+    for provider_key, vps, config, entry in jobs:
+        queues.setdefault(provider_key, deque()).append((vps, config, entry))
+    executor = _get_check_executor(settings['max_workers'])
+    limits = settings['provider_limits']
+    inflight: Dict[str, int] = {key: 0 for key in queues}
+    peaks: Dict[str, int] = {key: 0 for key in queues}
+    pending = {}
+
+    def submit_next(provider_key: str):
+        queue = queues[provider_key]
+        if not queue or inflight[provider_key] >= limits.get(provider_key, PROVIDER_MAX_INFLIGHT):
+            return False
+        vps, config, entry = queue.popleft()
+        future = executor.submit(_run_check, vps, config, entry)
+        pending[future] = provider_key
+        inflight[provider_key] += 1
+        peaks[provider_key] = max(peaks[provider_key], inflight[provider_key])
+        return True
+
+    for provider_key in queues:
+        while submit_next(provider_key):
+            pass
+    while pending:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for future in done:
+            provider_key = pending.pop(future)
+            inflight[provider_key] -= 1
+            submit_next(provider_key)
+    return peaks
+
+
+def _record_cycle_metrics(started_at: datetime.datetime, elapsed: float, checked: int, peaks: Dict[str, int]):
+    with _check_metrics_lock:
+        _check_metrics['cycles'] += 1
+        _check_metrics['last_cycle_started_at'] = started_at
+        _check_metrics['last_cycle_seconds'] = elapsed
+        _check_metrics['last_cycle_checked'] = checked
+        _check_metrics['provider_inflight_peak'] = dict(peaks)
+        previous_max = _check_metrics.get('max_cycle_seconds')
+        if previous_max is None or elapsed > previous_max:
+            _check_metrics['max_cycle_seconds'] = elapsed
+        previous_avg = _check_metrics.get('avg_cycle_seconds')
+        _check_metrics['avg_cycle_seconds'] = elapsed if previous_avg is None else previous_avg * 0.8 + elapsed * 0.2
+    logger.debug('Check cycle finished: %s VPS in %.2fs', checked, elapsed)
+    _log_check_summary()
+
+
+def _log_check_summary():
+    """Log cycle time and per-provider limiter totals every ``METRICS_LOG_INTERVAL`` seconds."""
+    global _metrics_logged_at
+    if METRICS_LOG_INTERVAL <= 0:
+        return
+    now = time.monotonic()
+    with _check_metrics_lock:
+        if _metrics_logged_at is None:
+            _metrics_logged_at = now
+            return
+        if now - _metrics_logged_at < METRICS_LOG_INTERVAL:
+            return
+        _metrics_logged_at = now
+    metrics = get_check_metrics()
+    limits = ', '.join(
+        f"{key}: {limit['waits']} waits / {limit['wait_seconds']:.1f}s, {limit['throttle_events']} throttled, rate {limit['rate']:g}/s"
+        for key, limit in sorted(metrics['rate_limits'].items())
+    )
+    logger.info(
+        'Check summary: %s cycles, last %.2fs, avg %.2fs, max %.2fs, %s retries; rate limits: %s',
+        metrics['cycles'], metrics['last_cycle_seconds'] or 0.0, metrics['avg_cycle_seconds'] or 0.0,
+        metrics['max_cycle_seconds'] or 0.0, metrics['retries_scheduled'], limits or 'none',
+    )
+
+
+def get_check_metrics() -> Dict[str, Any]:
+    with _check_metrics_lock:
+        snapshot = dict(_check_metrics)
+        snapshot['provider_inflight_peak'] = dict(_check_metrics['provider_inflight_peak'])
+    with _breakers_lock:
+        snapshot['breakers'] = {key: breaker.snapshot() for key, breaker in _provider_breakers.items()}
+        snapshot['rate_limits'] = {key: limiter.snapshot() for key, limiter in _provider_limiters.items()}
+    snapshot['coalesced_fetches'] = _fetch_flight.snapshot()
+    snapshot['parse_pool_workers'] = parse_pool_size()
+    snapshot['writes'] = write_buffer_stats()
+    snapshot['database'] = db_pool_stats()
+    snapshot['expiry_cache'] = expiry_cache_stats()
+    snapshot['scheduled_reminders'] = len(_reminder_scheduler)
+    snapshot['config'] = get_config().stats()
+    snapshot['quarantined'] = sorted(vps_id for vps_id, entry in list(_status_tracker.items()) if entry.get('quarantine'))
+    return snapshot
 
 
 def addVps(obj):
     addSql(obj['name'], obj['ops'], obj['cookie'])
+    _publish_live_updates()
+
+
+def _flush_check_writes():
+    try:
+        flush_vps_writes()
+    except Exception as exc:
+        logger.exception('Failed to flush buffered VPS updates, will retry next cycle: %s', exc)
+    try:
+        checkpoint_db()
+    except sqlite3.Error as exc:
+        logger.warning('WAL checkpoint failed: %s', exc)
+    try:
+        compact_history()
+    except sqlite3.Error as exc:
+        logger.warning('History compaction failed, will retry next interval: %s', exc)
 
 
 def CheckVPS():
+    started_at = _now_utc()
+    started = time.monotonic()
     vps_list = selectSql()
     if not vps_list:
         logger.debug('No VPS records found for monitoring.')
         _cleanup_tracker(set())
+        _check_scheduler.retain(())
+        _record_cycle_metrics(started_at, time.monotonic() - started, 0, {})
         return
+    now = time.monotonic()
     active_ids = set()
+    candidates = {}
     for vps in vps_list:
         try:
             vps_id = vps['id']
@@ -516,11 +1216,26 @@ def CheckVPS():
             logger.warning('Unable to recognise provider "%s" for VPS ID %s', provider_key, vps_id)
             continue
         entry = _ensure_tracker(vps_id, vps['state'])
-        try:
-            _check_single_vps(vps, config, entry)
-        except Exception as exc:
-            logger.exception('[%s] Unexpected error while checking VPS %s: %s', config['label'], vps_id, exc)
+        candidates[vps_id] = (provider_key, vps, config, entry)
+        quarantine = entry.get('quarantine')
+        if quarantine and quarantine['cookie'] != _cookie_fingerprint(vps['cookie']):
+            _lift_quarantine(vps_id, entry, 'cookie changed')
+            _check_scheduler.schedule(vps_id, now)
+        if vps_id not in _check_scheduler:
+            delay = 0.0 if entry.get('last_checked_at') is None else _next_check_interval(vps, entry)
+            _check_scheduler.schedule(vps_id, now + delay)
+    _check_scheduler.retain(candidates)
+    jobs = [candidates[vps_id] for vps_id in _check_scheduler.pop_due(now) if vps_id in candidates]
+    peaks = {}
+    if jobs:
+        settings = _current_checker_settings()
+        # small batches parse faster in-thread than through a process hop
+        _fetch_settings['use_parse_pool'] = parse_pool_size() > 0 and len(jobs) >= _fetch_settings['parse_pool_min_batch']
+        peaks = _dispatch_checks(jobs, settings)
+    _flush_check_writes()
     _cleanup_tracker(active_ids)
+    _record_cycle_metrics(started_at, time.monotonic() - started, len(jobs), peaks)
+    _publish_live_updates()
 
 
 def selectAllInfo():
@@ -531,17 +1246,15 @@ def selectAllInfo():
         return {'msg': res}
 
 
-def selectAllInfo_Info():
+def _build_dashboard_payload() -> Dict[str, Any]:
     res = selectSql()
     if not res:
         return {'msg': None}
     data = []
     for vps in res:
         expiry_dt, expiry_iso, expiry_display = resolve_expiry_values(
-            vps['creation_date'], vps['valid_until'], vps['expiry_utc']
+            vps['creation_date'], vps['valid_until'], vps['expiry_utc'], vps['ops']
         )
-        if expiry_iso and vps['expiry_utc'] != expiry_iso:
-            update_expiry_utc(vps['id'], expiry_iso)
         display_value = expiry_display or '—'
         data.append(
             (
@@ -559,6 +1272,101 @@ def selectAllInfo_Info():
     return {'msg': data}
 
 
+def get_dashboard_snapshot() -> Tuple[int, Dict[str, Any], str]:
+    """Return ``(version, payload, json_body)`` for the dashboard list.
+
+    The snapshot is rebuilt only when ``data_version()`` has moved since it
+    was taken; the version is read before the query, so a write that lands
+    mid-rebuild makes the next call rebuild again. ``expiry_utc`` write-back
+    is left to ``checkDateTime`` so that reads never write.
+    """
+    global _dashboard_snapshot
+    snapshot = _dashboard_snapshot
+    if snapshot is not None and snapshot[0] == data_version():
+        return snapshot
+    with _dashboard_lock:
+        snapshot = _dashboard_snapshot
+        version = data_version()
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot
+        payload = _build_dashboard_payload()
+        snapshot = (version, payload, json.dumps(payload))
+        _dashboard_snapshot = snapshot
+        return snapshot
+
+
+def selectAllInfo_Info():
+    return get_dashboard_snapshot()[1]
+
+
+def get_event_log() -> EventLog:
+    return _event_log
+
+
+def publish_dashboard_changes() -> int:
+    """Publish one ``vps`` event per dashboard row changed since the last call.
+
+    Rows are compared as they appear in ``/select``, so an event carries the
+    same list a poller would see; removed monitors produce ``vps-removed``.
+    """
+    with _published_lock:
+        version, payload, _ = get_dashboard_snapshot()
+        if version == _published_dashboard['version']:
+            return 0
+        rows = {row[0]: row for row in payload.get('msg') or []}
+        previous = _published_dashboard['rows']
+        published = 0
+        for vps_id, row in rows.items():
+            if previous.get(vps_id) != row:
+                _event_log.publish('vps', list(row))
+                published += 1
+        for vps_id in previous.keys() - rows.keys():
+            _event_log.publish('vps-removed', {'id': vps_id})
+            published += 1
+        _published_dashboard['version'] = version
+        _published_dashboard['rows'] = rows
+        return published
+
+
+def announce_due_notifications() -> int:
+    """Publish a ``notification`` event for PWA notifications that just became due."""
+    global _announced_notification_ids
+    with _published_lock:
+        due = set(pending_pwa_notification_ids())
+        fresh = sorted(due - _announced_notification_ids)
+        _announced_notification_ids = due
+        if fresh:
+            _event_log.publish('notification', {'ids': fresh})
+        return len(fresh)
+
+
+def wait_for_pwa_notifications(client_id: str, limit: int = 20, wait: float = 0.0) -> List[Dict[str, Any]]:
+    """Claim due PWA notifications, holding the caller up to ``wait`` seconds.
+
+    Between attempts the caller sleeps on the event log until something is
+    published or the next notification/lease is due, whichever is first.
+    """
+    deadline = time.monotonic() + max(0.0, wait)
+    while True:
+        cursor = _event_log.cursor()
+        notifications = fetch_pending_pwa_notifications(limit, client_id=client_id)
+        remaining = deadline - time.monotonic()
+        if notifications or remaining <= 0:
+            return notifications
+        next_due = seconds_until_next_pwa_notification()
+        timeout = remaining if next_due is None else min(remaining, max(next_due, 0.5))
+        _event_log.wait(cursor, timeout)
+
+
+def _publish_live_updates(*, notifications: bool = False):
+    try:
+        publish_dashboard_changes()
+        if notifications:
+            announce_due_notifications()
+    except Exception as exc:
+        logger.exception('Failed to publish dashboard events: %s', exc)
+
+
 def selectVPSForId(id_value):
     try:
         rows = selectSql_VPS_ID(id_value)
@@ -617,6 +1425,7 @@ def deleteVPS(raw_id):
         return {'msg': error_message, 'error': str(exc), 'success': False, 'status': 500}
 
     if affected:
+        _publish_live_updates()
         return {'msg': '删除成功', 'success': True, 'status': 200}
 
     message = '未找到对应监控。'
@@ -626,25 +1435,158 @@ def deleteVPS(raw_id):
 def updateVPS(list):
     try:
         updateVps(list[1], list[2], list[3], list[0])
+        try:
+            request_immediate_check(int(list[0]))
+        except (TypeError, ValueError):
+            pass
+        _publish_live_updates()
         return {'msg': f'修改成功'}
     except Exception as e:
         return {'msg': f'修改失败{e}'}
 
 
-def checkDateTime():
+def _reminder_labels(vps) -> Dict[str, Any]:
+    ops_label = vps['ops'] or ''
+    provider_key = str(ops_label).strip().lower()
+    provider_display = ops_label.upper() if ops_label else '未知'
+    name_label = vps['name'] or ''
+    return {
+        'ops_label': ops_label,
+        'provider_key': provider_key,
+        'provider_display': provider_display,
+        'name_label': name_label,
+        'display_name': name_label or provider_display or '未命名',
+        'renew_url': _resolve_renewal_url(provider_key),
+    }
+
+
+def _current_reminder_slot(
+    start: datetime.datetime, interval: datetime.timedelta, now_utc: datetime.datetime
+) -> datetime.datetime:
+    """Latest ``start + k * interval`` not after ``now_utc``, or ``start`` if it is still ahead."""
+    if now_utc <= start:
+        return start
+    return start + interval * ((now_utc - start) // interval)
+
+
+def _schedule_reminder(vps_id: int, kind: str, due: datetime.datetime, expiry_dt: datetime.datetime):
+    if due < expiry_dt:
+        _reminder_scheduler.schedule((vps_id, kind), due.timestamp())
+
+
+def _plan_expiry_reminders(vps, expiry_dt, expiry_iso, expiry_display, now_utc: datetime.datetime):
+    """Rebuild a VPS's reminder timers after its ``expiry_iso`` changed."""
+    vps_id = vps['id']
+    _reminder_scheduler.discard_vps(vps_id)
+    state = _ensure_expiry_state(vps_id, expiry_iso)
+    if expiry_dt is None or not expiry_iso:
+        # expiry no longer known: withdraw reminders queued for the old date
+        _clear_expiry_notifications(vps_id, 'expiry-warning', 'expiry-hourly')
+    elif expiry_dt <= now_utc:
+        _clear_expiry_notifications(vps_id, 'expiry-warning', 'expiry-hourly')
+        _reset_expiry_state(vps_id)
+    else:
+        if expiry_dt - now_utc > TWO_DAY_THRESHOLD:
+            labels = _reminder_labels(vps)
+            _schedule_initial_expiry_notification(
+                vps_id,
+                labels['display_name'],
+                labels['provider_display'],
+                expiry_display or format_malaysia_display(expiry_dt),
+                expiry_dt,
+                expiry_iso,
+                labels['renew_url'],
+                state,
+            )
+        _schedule_reminder(
+            vps_id,
+            'expiry-hourly',
+            _current_reminder_slot(expiry_dt - TWO_DAY_THRESHOLD, HOURLY_REMINDER_INTERVAL, now_utc),
+            expiry_dt,
+        )
+        _schedule_reminder(
+            vps_id,
+            'expiry-message',
+            _current_reminder_slot(expiry_dt - MESSAGE_REMINDER_WINDOW, MESSAGE_REMINDER_INTERVAL, now_utc),
+            expiry_dt,
+        )
+        _reminder_scheduler.schedule((vps_id, 'expired'), expiry_dt.timestamp())
+    _reminder_plans[vps_id] = (expiry_iso, expiry_dt, expiry_display)
+
+
+def _send_expiry_message(labels: Dict[str, Any], vps_id: int, pretty_time: str, time_until_expiry: datetime.timedelta):
+    ops_label = labels['ops_label']
+    provider_key = labels['provider_key']
+    message = (
+        f"你的{ops_label}小鸡\n"
+        f"名称:{labels['name_label']}即将到期\n"
+        f"到期时间为{pretty_time}\n"
+        f"距离到期还剩下{time_until_expiry}\n"
+    )
+    if provider_key == "vc":
+        sendMsg(vps_id, f"{message}[Renew](https://free.vps.vc/vps-renew)", "Markdown")
+    elif provider_key == "hax":
+        sendMsg(vps_id, f"{message}[Renew](https://hax.co.id/vps-renew/)", "Markdown")
+    elif provider_key == "woiden":
+        sendMsg(vps_id, f"{message}[Renew](https://woiden.id/vps-renew/)", "Markdown")
+    else:
+        sendMsg(vps_id, "出问题了咯，请检查看看")
+
+
+def _fire_expiry_reminder(vps_id: int, kind: str, now_utc: datetime.datetime):
+    vps = _reminder_rows.get(vps_id)
+    plan = _reminder_plans.get(vps_id)
+    if vps is None or plan is None or plan[1] is None:
+        return
+    expiry_iso, expiry_dt, expiry_display = plan
+    time_until_expiry = expiry_dt - now_utc
+    if kind == 'expired' or time_until_expiry <= datetime.timedelta(0):
+        _clear_expiry_notifications(vps_id, 'expiry-warning', 'expiry-hourly')
+        _reset_expiry_state(vps_id)
+        return
+    labels = _reminder_labels(vps)
+    pretty_time = expiry_display or format_malaysia_display(expiry_dt)
+    if kind == 'expiry-hourly':
+        slot = _current_reminder_slot(expiry_dt - TWO_DAY_THRESHOLD, HOURLY_REMINDER_INTERVAL, now_utc)
+        _schedule_reminder(vps_id, kind, slot + HOURLY_REMINDER_INTERVAL, expiry_dt)
+        _schedule_hourly_expiry_notification(
+            vps_id,
+            labels['display_name'],
+            labels['provider_display'],
+            labels['provider_key'],
+            labels['name_label'],
+            pretty_time,
+            expiry_dt,
+            expiry_iso,
+            labels['renew_url'],
+            now_utc,
+            _ensure_expiry_state(vps_id, expiry_iso),
+            time_until_expiry,
+        )
+    elif kind == 'expiry-message':
+        # tg() would silently skip a send that lands inside its rate limit
+        # (its last-send time only has whole seconds), so retry just after it
+        retry_delay = tg_retry_delay(vps_id)
+        if retry_delay is not None:
+            _schedule_reminder(vps_id, kind, now_utc + retry_delay, expiry_dt)
+            return
+        slot = _current_reminder_slot(expiry_dt - MESSAGE_REMINDER_WINDOW, MESSAGE_REMINDER_INTERVAL, now_utc)
+        _schedule_reminder(vps_id, kind, slot + MESSAGE_REMINDER_INTERVAL, expiry_dt)
+        _send_expiry_message(labels, vps_id, pretty_time, time_until_expiry)
+
+
+def _refresh_expiry_reminders() -> bool:
+    """Re-read the VPS list and rebuild the timers of rows whose expiry changed."""
     try:
         res = selectSql()
     except Exception as exc:
         logger.exception('Failed to query VPS list for expiry notifications: %s', exc)
-        return
+        return False
 
     active_ids: Set[int] = set()
-    if not res:
-        _cleanup_expiry_tracker(active_ids)
-        return
-
+    now_utc = _now_utc()
     try:
-        for vps in res:
+        for vps in res or ():
             vps_id = None
             try:
                 vps_id = vps['id']
@@ -653,89 +1595,48 @@ def checkDateTime():
                 continue
 
             active_ids.add(vps_id)
+            _reminder_rows[vps_id] = vps
 
             try:
                 expiry_dt, expiry_iso, expiry_display = resolve_expiry_values(
-                    vps['creation_date'], vps['valid_until'], vps['expiry_utc']
+                    vps['creation_date'], vps['valid_until'], vps['expiry_utc'], vps['ops']
                 )
                 if expiry_iso and vps['expiry_utc'] != expiry_iso:
                     update_expiry_utc(vps_id, expiry_iso)
-
-                state = _ensure_expiry_state(vps_id, expiry_iso)
-
-                if expiry_dt is None or not expiry_iso:
-                    if state is not None:
-                        _clear_expiry_notifications(vps_id, 'expiry-warning', 'expiry-hourly')
-                        _reset_expiry_state(vps_id)
-                    continue
-
-                now_utc = datetime.datetime.now(datetime.timezone.utc)
-                time_until_expiry = expiry_dt - now_utc
-                if time_until_expiry <= datetime.timedelta(0):
-                    _clear_expiry_notifications(vps_id, 'expiry-warning', 'expiry-hourly')
-                    _reset_expiry_state(vps_id)
-                    continue
-
-                ops_label = vps['ops'] or ''
-                provider_key = str(ops_label).strip().lower()
-                provider_display = ops_label.upper() if ops_label else '未知'
-                name_label = vps['name'] or ''
-                display_name = name_label or provider_display or '未命名'
-                pretty_time = expiry_display or format_malaysia_display(expiry_dt)
-                renew_url = _resolve_renewal_url(provider_key)
-
-                if time_until_expiry > TWO_DAY_THRESHOLD:
-                    _schedule_initial_expiry_notification(
-                        vps_id,
-                        display_name,
-                        provider_display,
-                        pretty_time,
-                        expiry_dt,
-                        expiry_iso,
-                        renew_url,
-                        state,
-                    )
-                    if state and state.get('urgent'):
-                        _clear_expiry_notifications(vps_id, 'expiry-hourly')
-                    if state:
-                        state['urgent'] = False
-                        state['last_slot_index'] = None
-                        state['last_notification_at'] = None
-                        state.pop('last_remaining_seconds', None)
-                else:
-                    if state is None:
-                        state = _ensure_expiry_state(vps_id, expiry_iso)
-                    _schedule_hourly_expiry_notification(
-                        vps_id,
-                        display_name,
-                        provider_display,
-                        provider_key,
-                        name_label,
-                        pretty_time,
-                        expiry_dt,
-                        expiry_iso,
-                        renew_url,
-                        now_utc,
-                        state,
-                        time_until_expiry,
-                    )
-
-                if datetime.timedelta(days=0) < time_until_expiry <= datetime.timedelta(days=3):
-                    message = (
-                        f"你的{ops_label}小鸡\n"
-                        f"名称:{name_label}即将到期\n"
-                        f"到期时间为{pretty_time}\n"
-                        f"距离到期还剩下{time_until_expiry}\n"
-                    )
-                    if provider_key == "vc":
-                        sendMsg(vps_id, f"{message}[Renew](https://free.vps.vc/vps-renew)", "Markdown")
-                    elif provider_key == "hax":
-                        sendMsg(vps_id, f"{message}[Renew](https://hax.co.id/vps-renew/)", "Markdown")
-                    elif provider_key == "woiden":
-                        sendMsg(vps_id, f"{message}[Renew](https://woiden.id/vps-renew/)", "Markdown")
-                    else:
-                        sendMsg(vps_id, "出问题了咯，请检查看看")
+                plan = _reminder_plans.get(vps_id)
+                if plan is None or plan[0] != expiry_iso:
+                    _plan_expiry_reminders(vps, expiry_dt, expiry_iso, expiry_display, now_utc)
             except Exception as exc:
                 logger.exception('Failed to process expiry reminder for VPS %s: %s', vps_id, exc)
     finally:
+        for vps_id in [vid for vid in _reminder_plans if vid not in active_ids]:
+            _reminder_plans.pop(vps_id, None)
+        for vps_id in [vid for vid in _reminder_rows if vid not in active_ids]:
+            _reminder_rows.pop(vps_id, None)
+        _reminder_scheduler.retain(active_ids)
         _cleanup_expiry_tracker(active_ids)
+    return True
+
+
+def checkDateTime():
+    """Fire the expiry reminders that are due.
+
+    Reminders live in a min-heap of fire times: the 2-day PWA warning is
+    queued when a VPS's timers are built, then each hourly PWA slot, each
+    Telegram/email slot of the 3-day window and the expiry itself get an
+    entry. The VPS list is only re-read when ``data_version()`` moved, and
+    a VPS's timers are only rebuilt when its ``expiry_iso`` changed.
+    """
+    global _reminder_data_version
+    try:
+        version = data_version()
+        if version != _reminder_data_version and _refresh_expiry_reminders():
+            _reminder_data_version = version
+        now_utc = _now_utc()
+        for vps_id, kind in _reminder_scheduler.pop_due(now_utc.timestamp()):
+            try:
+                _fire_expiry_reminder(vps_id, kind, now_utc)
+            except Exception as exc:
+                logger.exception('Failed to send %s reminder for VPS %s: %s', kind, vps_id, exc)
+    finally:
+        _publish_live_updates(notifications=True)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Compare the targeted vps-info extractor with the old BeautifulSoup pass.
+
+Run from the project root:
+
+    python3 benchmarks/bench_extractor.py [iterations]
+
+The pages under benchmarks/pages are reconstructions of the hax, woiden
+and vc vps-info pages (plus a logged-out page) with the account data
+replaced by placeholders.
+"""
+import sys
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from extractor import ESSENTIAL_KEYS, REQUIRED_LABELS, extract_vps_info  # noqa: E402
+
+PAGES_DIR = Path(__file__).resolve().parent / 'pages'
+
+
+def soup_parse_vps_info(html):
+    """The ``_parse_vps_info`` implementation the extractor replaced."""
+    soup = BeautifulSoup(html, 'html.parser')
+    if soup is None:
+        return None, 'unable to parse response'
+    keys = soup.find_all('label', {'class': 'col-sm-5 col-form-label'})
+    values = soup.find_all('div', {'class': 'col-sm-7'})
+    info = {}
+    for key_el, value_el in zip(keys, values):
+        label = key_el.get_text(strip=True)
+        if label in REQUIRED_LABELS:
+            info[label] = value_el.get_text(strip=True)
+    has_required = all(info.get(field) for field in ESSENTIAL_KEYS)
+    if has_required:
+        return info, None
+    html_lower = html.lower()
+    if soup.find('form', {'id': 'loginform'}) or 'loginform' in html_lower:
+        return None, 'login form detected, cookie may be expired'
+    if soup.find('input', {'name': 'log'}) or soup.find('input', {'name': 'pwd'}):
+        return None, 'authentication page detected'
+    return None, 'required VPS fields missing'
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pages = sorted(PAGES_DIR.glob('*.html'))
+    print(f'{"page":<12}{"bytes":>8}{"soup ms":>10}{"extract ms":>12}{"speedup":>9}')
+    for path in pages:
+        html = path.read_text(encoding='utf-8')
+        expected = soup_parse_vps_info(html)
+        actual = extract_vps_info(html)
+        if expected != actual:
+            raise SystemExit(f'{path.name}: extractor returned {actual!r}, expected {expected!r}')
+        soup_seconds = timeit.timeit(lambda: soup_parse_vps_info(html), number=iterations)
+        fast_seconds = timeit.timeit(lambda: extract_vps_info(html), number=iterations)
+        print(
+            f'{path.stem:<12}{len(html):>8}'
+            f'{soup_seconds / iterations * 1000:>10.3f}'
+            f'{fast_seconds / iterations * 1000:>12.3f}'
+            f'{soup_seconds / fast_seconds:>8.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
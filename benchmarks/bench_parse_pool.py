@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Measure how the process-pool parse stage scales with worker count.
+
+Run from the project root:
+
+    python3 benchmarks/bench_parse_pool.py [pages] [threads]
+
+Each run parses ``pages`` copies of the sample vps-info pages from
+``threads`` checker threads, first in-thread (0 workers) and then through
+pools of 1, 2, 4 ... up to the CPU count.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import extractor  # noqa: E402
+
+PAGES_DIR = Path(__file__).resolve().parent / 'pages'
+
+
+def worker_counts():
+    cpus = os.cpu_count() or 1
+    counts = [0]
+    size = 1
+    while size < cpus:
+        counts.append(size)
+        size *= 2
+    counts.append(cpus)
+    return counts
+
+
+def run(workload, expected, threads):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(extractor.extract_vps_info_pooled, workload))
+    elapsed = time.perf_counter() - started
+    if results != expected[: len(results)]:
+        raise SystemExit('pooled parse returned a different result')
+    return elapsed
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    pages = [path.read_text(encoding='utf-8') for path in sorted(PAGES_DIR.glob('*.html'))]
+    workload = [pages[index % len(pages)] for index in range(total)]
+    expected = [extractor.extract_vps_info(html) for html in workload]
+    print(f'{total} pages from {threads} threads, {os.cpu_count()} CPUs')
+    print(f'{"workers":>8}{"seconds":>10}{"pages/s":>10}{"speedup":>9}')
+    baseline = None
+    for workers in worker_counts():
+        extractor.configure_parse_pool(workers)
+        if workers:
+            run(workload[: workers * 2], expected, threads)
+        elapsed = run(workload, expected, threads)
+        baseline = baseline or elapsed
+        print(f'{workers:>8}{elapsed:>10.2f}{total / elapsed:>10.0f}{baseline / elapsed:>8.1f}x')
+    extractor.configure_parse_pool(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Per-row cost of resolving expiry columns into (datetime, ISO, MYT display).
+
+Run from the project root:
+
+    python3 benchmarks/expiry_resolution.py [rows] [rounds]
+
+``rows`` VPS rows spread over the providers' date formats are resolved
+``rounds`` times, the way ``checkDateTime`` and ``/select`` resolve every
+row on every cycle:
+
+* ``no cache``: every pattern tried in declaration order and a full pytz
+  ``localize`` per value (the old path),
+* ``memoised parse``: no result cache, but each provider's last matching
+  pattern is tried first and the localized offset comes from the per-hour
+  memo,
+* ``lru cache``: ``resolve_expiry_values`` with a warm cache.
+"""
+import datetime
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import sql  # noqa: E402
+
+# creation_date / valid_until formats as scraped, plus one row that only has a creation date
+PROVIDER_FORMATS = (
+    ('hax', '%B %d, %Y', '%B %d, %Y %I:%M %p'),
+    ('woiden', '%b %d, %Y', '%b %d, %Y %H:%M'),
+    ('vc', '%Y/%m/%d', '%Y/%m/%d %H:%M'),
+)
+
+
+def build_rows(count):
+    base = datetime.datetime(2024, 1, 1, 8, 30)
+    rows = []
+    for index in range(count):
+        provider, creation_format, valid_format = PROVIDER_FORMATS[index % len(PROVIDER_FORMATS)]
+        created = base + datetime.timedelta(days=index % 300, minutes=index)
+        valid_until = '' if index % 10 == 9 else (created + datetime.timedelta(days=5)).strftime(valid_format)
+        rows.append((provider, created.strftime(creation_format), valid_until, None))
+    return rows
+
+
+def per_row_us(rows, rounds, resolve, before_each=None):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for provider, creation, valid, expiry in rows:
+            if before_each is not None:
+                before_each()
+            resolve(creation, valid, expiry, provider)
+    return (time.perf_counter() - started) / (rounds * len(rows)) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows = build_rows(count)
+    sql.clear_expiry_cache()
+    results = [
+        ('no cache', per_row_us(rows, rounds, sql._resolve_expiry_uncached, sql.clear_expiry_cache)),
+        ('memoised parse', per_row_us(rows, rounds, sql._resolve_expiry_uncached)),
+    ]
+    sql.clear_expiry_cache()
+    per_row_us(rows, 1, sql.resolve_expiry_values)
+    results.append(('lru cache', per_row_us(rows, rounds, sql.resolve_expiry_values)))
+    print(f'{count} rows x {rounds} rounds')
+    print(f'{"path":<16}{"us/row":>9}')
+    for label, cost in results:
+        print(f'{label:<16}{cost:>9.2f}')
+    print(sql.expiry_cache_stats())
+
+
+if __name__ == '__main__':
+    main()
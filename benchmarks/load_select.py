@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""/select throughput of each ``[server]`` mode while the checker is writing.
+
+Run from the project root:
+
+    python3 benchmarks/load_select.py [seconds] [clients] [streams]
+
+Every configuration runs the real bottle app in its own process on a fresh
+database in a temporary directory. A background thread in that process
+stands in for the checker: it rewrites every VPS row through the write
+buffer and publishes the live updates a few times a second, so the
+dashboard snapshot keeps being rebuilt. ``clients`` threads in this
+process then poll ``/select`` over keep-alive connections, while
+``streams`` extra connections hold ``/events`` open the way open
+dashboards do.
+"""
+import http.client
+import importlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+VPS_ROWS = 200
+CHECKER_INTERVAL = 0.2
+CLIENT_TIMEOUT = 2.0
+CONFIGURATIONS = (
+    ('wsgiref', 1),
+    ('threaded', 1),
+    ('threaded', 4),
+    ('threaded', 16),
+    ('threaded', 64),
+)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def serve(mode, workers, port):
+    os.chdir(tempfile.mkdtemp(prefix='load-select-'))
+    import add
+    import bottle
+    import sql
+    import wsgi_server
+
+    importlib.import_module('main')  # registers the routes
+    sql.init_db()
+    for index in range(VPS_ROWS):
+        sql.addSql(f'vps-{index}', 'hax', 'cookie')
+    ids = [row['id'] for row in sql.selectSql()]
+
+    def checker():
+        cycle = 0
+        while True:
+            cycle += 1
+            for vps_id in ids:
+                sql.buffer_info_update('2024-01-01', f'2024-01-{cycle % 28 + 1:02d}', 'X', '::1', '1G', '10G', vps_id)
+            sql.flush_vps_writes()
+            add._publish_live_updates()
+            time.sleep(CHECKER_INTERVAL)
+
+    threading.Thread(target=checker, daemon=True).start()
+    if mode == 'wsgiref':
+        bottle.run(host='127.0.0.1', port=port, server='wsgiref', quiet=True)
+    else:
+        settings = wsgi_server.read_settings({'workers': str(workers)})
+        wsgi_server.build_server('127.0.0.1', port, bottle.default_app(), settings, quiet=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def hold_stream(port, stop):
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=CLIENT_TIMEOUT)
+        conn.request('GET', '/events')
+        reply = conn.getresponse()
+        while not stop.is_set():
+            try:
+                reply.read1(4096)
+            except socket.timeout:
+                continue
+    except OSError:
+        pass
+
+
+def run_load(port, seconds, clients, streams):
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'ok': 0, 'errors': 0, 'connections': 0}
+    latencies = []
+
+    for _ in range(streams):
+        threading.Thread(target=hold_stream, args=(port, stop), daemon=True).start()
+    time.sleep(0.5)
+
+    def client():
+        local = []
+        errors = 0
+        connections = 0
+        conn = None
+        while not stop.is_set():
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=CLIENT_TIMEOUT)
+                connections += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', '/select', headers={'Accept-Encoding': 'gzip'})
+                reply = conn.getresponse()
+                reply.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = None
+                continue
+            if reply.status == 200:
+                local.append(time.perf_counter() - started)
+            else:
+                errors += 1
+            if reply.will_close:
+                conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+        with lock:
+            counts['ok'] += len(local)
+            counts['errors'] += errors
+            counts['connections'] += connections
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts, latencies
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    streams = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    print(f'{clients} /select clients, {streams} open /events streams, {seconds:g}s per configuration, {os.cpu_count()} CPU(s)')
+    print(f'{"mode":<10}{"workers":>8}{"req/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"errors":>8}{"conns":>7}')
+    for mode, workers in CONFIGURATIONS:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, __file__, '--serve', mode, str(workers), str(port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port)
+            counts, latencies = run_load(port, seconds, clients, streams)
+        finally:
+            server.kill()
+            server.wait()
+        print(
+            f'{mode:<10}{workers:>8}{counts["ok"] / seconds:>9.0f}'
+            f'{percentile(latencies, 0.5) * 1000:>9.2f}'
+            f'{percentile(latencies, 0.99) * 1000:>9.2f}'
+            f'{counts["errors"]:>8}{counts["connections"]:>7}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Concurrent /select readers against the checker's batched writes.
+
+Run from the project root:
+
+    python3 benchmarks/stress_sqlite.py [seconds] [readers] [busy_timeout_ms]
+
+Each journal mode runs in its own process on a fresh database in a
+temporary directory: reader threads loop over ``selectSql()`` (what
+``/select`` does) while one writer thread rewrites every VPS row through
+the write buffer and appends send-history rows, like a busy checker cycle.
+Pass a ``busy_timeout_ms`` of 0 to see lock errors instead of lock waits.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MODES = ('delete', 'wal')
+VPS_ROWS = 200
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_mode(mode, seconds, readers, busy_timeout):
+    import sql
+
+    sql.DB_PATH = os.path.join(tempfile.mkdtemp(prefix='stress-sqlite-'), 'monitor.db')
+    sql.configure_storage({'journal_mode': mode, 'busy_timeout': str(busy_timeout), 'checkpoint_interval': '1'})
+    sql.init_db()
+    for index in range(VPS_ROWS):
+        sql.addSql(f'vps-{index}', 'hax', 'cookie')
+    ids = [row['id'] for row in sql.selectSql()]
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'reads': 0, 'read_errors': 0, 'flushes': 0, 'write_errors': 0}
+    latencies = []
+
+    def reader():
+        local = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                sql.selectSql()
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['read_errors'] += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            counts['reads'] += len(local)
+            latencies.extend(local)
+
+    def writer():
+        cycle = 0
+        while not stop.is_set():
+            cycle += 1
+            try:
+                for vps_id in ids:
+                    sql.buffer_info_update('2024-01-01', f'2024-01-{cycle % 28 + 1:02d}', 'X', '::1', '1G', '10G', vps_id)
+                sql.flush_vps_writes()
+                sql.addSend(ids[cycle % len(ids)], 'stress', 1)
+                sql.checkpoint_db()
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['write_errors'] += 1
+                continue
+            with lock:
+                counts['flushes'] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(
+        f'{mode:<8}{counts["reads"] / seconds:>10.0f}'
+        f'{percentile(latencies, 0.5) * 1000:>9.2f}'
+        f'{percentile(latencies, 0.99) * 1000:>9.2f}'
+        f'{counts["read_errors"]:>8}'
+        f'{counts["flushes"] / seconds:>10.1f}'
+        f'{counts["write_errors"]:>8}'
+    )
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], float(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]))
+        return
+    seconds = sys.argv[1] if len(sys.argv) > 1 else '5'
+    readers = sys.argv[2] if len(sys.argv) > 2 else '16'
+    busy_timeout = sys.argv[3] if len(sys.argv) > 3 else '5000'
+    print(f'{readers} readers, 1 writer, {seconds}s per mode, busy_timeout={busy_timeout}ms')
+    print(f'{"mode":<8}{"reads/s":>10}{"p50 ms":>9}{"p99 ms":>9}{"r.err":>8}{"flush/s":>10}{"w.err":>8}')
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, '--mode', mode, seconds, readers, busy_timeout], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import configparser
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+CONFIG_PATH = 'config.ini'
+# 最多每隔多少秒检查一次 config.ini 的修改时间
+CONFIG_CHECK_INTERVAL = 1.0
+
+
+def _flag(raw) -> Optional[bool]:
+    value = str(raw or '').strip()
+    if value == '1':
+        return True
+    if value == '0':
+        return False
+    return None
+
+
+def _split_list(raw) -> List[str]:
+    items = []
+    for item in str(raw or '').split(','):
+        item = item.strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+def _build_view(sections: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    view: Dict[str, Any] = {}
+    options = sections.get('options')
+    view['options'] = None if options is None else {
+        'tgbot': _flag(options.get('tgbot')),
+        'email': _flag(options.get('email')),
+    }
+    tgbot_info = sections.get('tgbot_info')
+    view['tgbot_info'] = None if tgbot_info is None else {
+        'tgbot_token': tgbot_info.get('tgbot_token', '').strip(),
+        'chat_ids': _split_list(tgbot_info.get('chat_ids')),
+    }
+    email_info = sections.get('email_info')
+    view['email_info'] = None if email_info is None else {
+        'sender_email': email_info.get('sender_email', '').strip(),
+        'sender_password': email_info.get('sender_password', ''),
+        'receiver_email': _split_list(email_info.get('receiver_email')),
+        'smtp_server': email_info.get('smtp_server', '').strip(),
+        'subject': email_info.get('subject', ''),
+    }
+    password = sections.get('password')
+    view['password'] = None if password is None else password.get('password')
+    port = None
+    prot = sections.get('prot')
+    if prot is not None:
+        try:
+            port = int(str(prot.get('port') or '').strip())
+        except ValueError:
+            port = None
+    view['port'] = port
+    return view
+
+
+class ConfigService:
+    """config.ini parsed once and re-parsed only when the file changes.
+
+    Lookups stat the file at most every ``CONFIG_CHECK_INTERVAL`` seconds
+    and re-parse it when its mtime or size moved. A file that fails to
+    parse keeps the last good configuration. Subscribers are called with
+    the set of section names whose contents changed.
+    """
+
+    def __init__(self, path: str = CONFIG_PATH, check_interval: float = CONFIG_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at: Optional[float] = None
+        self._sections: Optional[Dict[str, Dict[str, str]]] = None
+        self._view: Dict[str, Any] = _build_view({})
+        self._subscribers: List[Callable[[Set[str]], None]] = []
+        self._stats = {'checks': 0, 'reloads': 0, 'errors': 0}
+
+    def subscribe(self, callback: Callable[[Set[str]], None]):
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Set[str]], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def refresh(self, force: bool = False) -> Set[str]:
+        """Re-parse the file if it changed; returns the names of changed sections."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return set()
+            self._checked_at = now
+            self._stats['checks'] += 1
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+            if signature == self._signature and not force:
+                return set()
+            if signature is None:
+                sections = None
+            else:
+                parser = configparser.ConfigParser()
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        parser.read_file(f)
+                except (OSError, UnicodeDecodeError, configparser.Error) as exc:
+                    self._stats['errors'] += 1
+                    self._signature = signature
+                    logger.warning('Failed to parse %s, keeping the previous configuration: %s', self.path, exc)
+                    return set()
+                sections = {name: dict(parser.items(name)) for name in parser.sections()}
+            previous = self._sections or {}
+            current = sections or {}
+            changed = {name for name in set(previous) | set(current) if previous.get(name) != current.get(name)}
+            self._signature = signature
+            self._sections = sections
+            self._view = _build_view(current)
+            self._stats['reloads'] += 1
+            subscribers = list(self._subscribers)
+        if changed:
+            logger.info('Loaded %s (changed sections: %s)', self.path, ', '.join(sorted(changed)))
+            for callback in subscribers:
+                try:
+                    callback(changed)
+                except Exception as exc:
+                    logger.exception('Config subscriber %r failed: %s', callback, exc)
+        return changed
+
+    def section(self, name: str) -> Optional[Dict[str, str]]:
+        """A copy of section ``name``, or ``None`` if the file or the section is missing."""
+        self.refresh()
+        with self._lock:
+            if self._sections is None or name not in self._sections:
+                return None
+            return dict(self._sections[name])
+
+    def _view_item(self, key: str):
+        self.refresh()
+        with self._lock:
+            value = self._view[key]
+        return dict(value) if isinstance(value, dict) else value
+
+    def options(self) -> Optional[Dict[str, Optional[bool]]]:
+        """``{'tgbot': bool, 'email': bool}``; a value other than 0/1 is ``None``."""
+        return self._view_item('options')
+
+    def tgbot_info(self) -> Optional[Dict[str, Any]]:
+        return self._view_item('tgbot_info')
+
+    def email_info(self) -> Optional[Dict[str, Any]]:
+        return self._view_item('email_info')
+
+    def password(self) -> Optional[str]:
+        return self._view_item('password')
+
+    def port(self) -> Optional[int]:
+        return self._view_item('port')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_config = ConfigService()
+
+
+def get_config() -> ConfigService:
+    return _config
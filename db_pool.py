@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PooledConnection(sqlite3.Connection):
+    """``sqlite3`` connection whose ``close()`` hands it back to its pool.
+
+    Passed as ``factory=`` to ``sqlite3.connect`` so that the existing
+    ``conn = connSqlite() ... conn.close()`` call sites keep working while
+    the underlying connection (and its statement cache) stays open.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool: Optional['ConnectionPool'] = None
+        self._idle = False
+        self._generation = 0
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+            return
+        pool.release(self)
+
+    def discard(self):
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """LIFO pool of long-lived SQLite connections shared across threads.
+
+    ``connect`` must return a :class:`PooledConnection` opened with
+    ``check_same_thread=False``; a connection is only ever used by the thread
+    that checked it out. Connections are created on demand and at most
+    ``max_idle`` of them are kept open between uses. :meth:`close_all`
+    also retires connections that are checked out at the time, so settings
+    applied in ``connect`` take effect for every connection handed out
+    afterwards.
+    """
+
+    def __init__(self, connect: Callable[[], PooledConnection], max_idle: int = 8):
+        self._connect = connect
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: List[PooledConnection] = []
+        self._created = 0
+        self._reused = 0
+        self._generation = 0
+
+    def acquire(self) -> PooledConnection:
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self._reused += 1
+            else:
+                self._created += 1
+            generation = self._generation
+        if conn is None:
+            conn = self._connect()
+            conn._generation = generation
+        conn._pool = self
+        conn._idle = False
+        return conn
+
+    def release(self, conn: PooledConnection):
+        if conn._idle:
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.discard()
+            return
+        with self._lock:
+            if conn._generation == self._generation and len(self._idle) < self.max_idle:
+                conn._idle = True
+                self._idle.append(conn)
+                return
+        conn.discard()
+
+    def close_all(self):
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+            self._generation += 1
+        for conn in idle:
+            try:
+                conn.discard()
+            except sqlite3.Error:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'created': self._created,
+                'reused': self._reused,
+            }
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+EVENT_LOG_SIZE = 1000
+
+
+class EventLog:
+    """Bounded, replayable log of dashboard events for ``/events`` streams.
+
+    Event ids are ``<boot>:<sequence>`` so that a ``Last-Event-ID`` from a
+    previous process, or one that has already scrolled out of the log, is
+    recognised as unresumable and the client gets a full snapshot instead.
+    """
+
+    def __init__(self, size: int = EVENT_LOG_SIZE):
+        self.boot_id = format(int(time.time() * 1000), 'x')
+        self._events = deque(maxlen=size)
+        self._sequence = itertools.count(1)
+        self._last_sequence = 0
+        self._condition = threading.Condition()
+        self._published = 0
+
+    def publish(self, event_type: str, data: Any) -> str:
+        with self._condition:
+            sequence = next(self._sequence)
+            self._events.append((sequence, event_type, data))
+            self._last_sequence = sequence
+            self._published += 1
+            self._condition.notify_all()
+        return self.event_id(sequence)
+
+    def event_id(self, sequence: int) -> str:
+        return f'{self.boot_id}:{sequence}'
+
+    def cursor(self) -> int:
+        with self._condition:
+            return self._last_sequence
+
+    def resume_cursor(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence to replay from, or ``None`` if ``last_event_id`` can't be resumed."""
+        if not last_event_id:
+            return None
+        boot_id, _, raw_sequence = str(last_event_id).strip().partition(':')
+        if boot_id != self.boot_id:
+            return None
+        try:
+            sequence = int(raw_sequence)
+        except ValueError:
+            return None
+        with self._condition:
+            if sequence > self._last_sequence:
+                return None
+            oldest = self._events[0][0] if self._events else self._last_sequence + 1
+            if sequence + 1 < oldest:
+                return None
+        return sequence
+
+    def wait(self, cursor: int, timeout: float) -> Tuple[int, Optional[List[Tuple[str, str, Any]]]]:
+        """Events after ``cursor`` as ``(id, type, data)``, waiting up to ``timeout``.
+
+        The list is ``None`` when events after ``cursor`` have already been
+        dropped from the log; the caller has to resynchronise from scratch.
+        """
+        with self._condition:
+            if self._last_sequence <= cursor:
+                self._condition.wait(timeout)
+            if self._events and self._events[0][0] > cursor + 1:
+                return self._last_sequence, None
+            pending = [event for event in self._events if event[0] > cursor]
+        if not pending:
+            return cursor, []
+        return pending[-1][0], [(self.event_id(sequence), event_type, data) for sequence, event_type, data in pending]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {'published': self._published, 'buffered': len(self._events), 'last_sequence': self._last_sequence}
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+REQUIRED_LABELS = (
+    'VPS Creation Date',
+    'Valid until',
+    'IPv6',
+    'Location',
+    'Total disk space',
+    'Ram',
+)
+ESSENTIAL_KEYS = ('VPS Creation Date', 'Valid until')
+
+LABEL_CLASS = 'col-sm-5 col-form-label'
+VALUE_CLASS = 'col-sm-7'
+LOGIN_MARKER = 'loginform'
+LOGIN_INPUT_NAMES = ('log', 'pwd')
+HEAD_SKIP_LIMIT = 256 * 1024
+
+LOGIN_FORM_ERROR = 'login form detected, cookie may be expired'
+AUTH_PAGE_ERROR = 'authentication page detected'
+LOGIN_ERRORS = (LOGIN_FORM_ERROR, AUTH_PAGE_ERROR)
+
+_LOGIN_MARKER_RE = re.compile(LOGIN_MARKER, re.IGNORECASE)
+_BODY_TAG_RE = re.compile(r'<body[\s/>]', re.IGNORECASE)
+_IGNORED_TEXT_TAGS = ('script', 'style')
+
+_parse_pool_lock = threading.Lock()
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_workers = 0
+
+
+class _ExtractionComplete(Exception):
+    pass
+
+
+class _Capture:
+    __slots__ = ('tag', 'parts', 'depth', 'closed')
+
+    def __init__(self, tag: str):
+        self.tag = tag
+        self.parts: List[str] = []
+        self.depth = 1
+        self.closed = False
+
+
+class VpsInfoExtractor(HTMLParser):
+    """Incremental extractor for the provider vps-info page.
+
+    Collects the text of ``label.col-sm-5.col-form-label`` and
+    ``div.col-sm-7`` elements in document order and pairs them by position,
+    the same way the previous BeautifulSoup ``find_all``/``zip`` pass did.
+    Everything before ``<body`` is skipped without tokenising (the head of
+    these pages is mostly inline scripts and styles), and parsing stops as
+    soon as every label in ``REQUIRED_LABELS`` has been paired with a
+    finished value. The login markers only pick the error message when the
+    essential fields are missing.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.info: Dict[str, str] = {}
+        self.complete = False
+        self.login_marker_seen = False
+        self.login_input_seen = False
+        self._keys: List[_Capture] = []
+        self._values: List[_Capture] = []
+        self._open: List[_Capture] = []
+        self._pending_text: List[str] = []
+        self._ignored_depth = 0
+        self._paired = 0
+        self._marker_tail = ''
+        self._head_buffer: Optional[str] = ''
+
+    def feed(self, data: str):
+        if self.complete or not data:
+            return
+        if not self.login_marker_seen:
+            window = self._marker_tail + data
+            if _LOGIN_MARKER_RE.search(window):
+                self.login_marker_seen = True
+            self._marker_tail = window[-(len(LOGIN_MARKER) - 1):]
+        if self._head_buffer is not None:
+            data = self._skip_head(data)
+            if not data:
+                return
+        try:
+            super().feed(data)
+        except _ExtractionComplete:
+            self.complete = True
+
+    def close(self):
+        if self.complete:
+            return
+        try:
+            if self._head_buffer:
+                super().feed(self._head_buffer)
+            self._head_buffer = None
+            super().close()
+            self._flush_text()
+            for capture in self._open:
+                capture.closed = True
+            self._open = []
+            self._pair_ready()
+        except _ExtractionComplete:
+            self.complete = True
+
+    def result(self) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+        if all(self.info.get(field) for field in ESSENTIAL_KEYS):
+            return dict(self.info), None
+        if self.login_marker_seen:
+            return None, LOGIN_FORM_ERROR
+        if self.login_input_seen:
+            return None, AUTH_PAGE_ERROR
+        return None, 'required VPS fields missing'
+
+    def _skip_head(self, data: str) -> str:
+        buffered = self._head_buffer + data
+        search_from = max(0, len(self._head_buffer) - 6)
+        match = _BODY_TAG_RE.search(buffered, search_from)
+        if match is not None:
+            self._head_buffer = None
+            return buffered[match.start():]
+        if len(buffered) > HEAD_SKIP_LIMIT:
+            self._head_buffer = None
+            return buffered
+        self._head_buffer = buffered
+        return ''
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in _IGNORED_TEXT_TAGS:
+            self._ignored_depth += 1
+            return
+        for capture in self._open:
+            if capture.tag == tag:
+                capture.depth += 1
+        if tag == 'input' and not self.login_input_seen:
+            for name, value in attrs:
+                if name == 'name' and value in LOGIN_INPUT_NAMES:
+                    self.login_input_seen = True
+                    break
+        if tag != 'label' and tag != 'div':
+            return
+        classes = None
+        for name, value in attrs:
+            if name == 'class':
+                classes = (value or '').split()
+                break
+        if not classes:
+            return
+        if tag == 'label' and ' '.join(classes) == LABEL_CLASS:
+            capture = _Capture(tag)
+            self._keys.append(capture)
+            self._open.append(capture)
+        elif tag == 'div' and VALUE_CLASS in classes:
+            capture = _Capture(tag)
+            self._values.append(capture)
+            self._open.append(capture)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag in _IGNORED_TEXT_TAGS:
+            if self._ignored_depth:
+                self._ignored_depth -= 1
+            return
+        closed = False
+        for capture in self._open:
+            if capture.tag == tag:
+                capture.depth -= 1
+                if capture.depth == 0:
+                    capture.closed = True
+                    closed = True
+        if closed:
+            self._open = [capture for capture in self._open if not capture.closed]
+            self._pair_ready()
+
+    def handle_data(self, data):
+        if self._ignored_depth or not self._open:
+            return
+        self._pending_text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def _flush_text(self):
+        if not self._pending_text:
+            return
+        text = ''.join(self._pending_text).strip()
+        self._pending_text = []
+        if not text:
+            return
+        for capture in self._open:
+            capture.parts.append(text)
+
+    def _pair_ready(self):
+        while self._paired < len(self._keys) and self._paired < len(self._values):
+            key = self._keys[self._paired]
+            value = self._values[self._paired]
+            if not (key.closed and value.closed):
+                break
+            label = ''.join(key.parts)
+            if label in REQUIRED_LABELS:
+                self.info[label] = ''.join(value.parts)
+            self._paired += 1
+        if len(self.info) == len(REQUIRED_LABELS):
+            raise _ExtractionComplete()
+
+
+def extract_vps_info(html: str) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    extractor = VpsInfoExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.result()
+
+
+def section_fingerprint(html: str) -> Optional[str]:
+    """Hash of the part of the page the extractor's result depends on.
+
+    The section runs from the first label/value element in the body to the
+    end of the last ``col-sm-7`` value, so two pages with the same
+    fingerprint extract to the same fields. Returns ``None`` when the
+    section cannot be delimited safely, in which case the caller must parse.
+    """
+    body = _BODY_TAG_RE.search(html)
+    offset = body.start() if body is not None else 0
+    starts = [index for index in (html.find(LABEL_CLASS, offset), html.find(VALUE_CLASS, offset)) if index >= 0]
+    if not starts:
+        return None
+    start = html.rfind('<', offset, min(starts))
+    last_value = html.rfind(VALUE_CLASS)
+    end = html.find('</div>', last_value)
+    if start < 0 or end < 0 or '<div' in html[last_value:end]:
+        return None
+    return hashlib.sha1(html[start:end].encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def configure_parse_pool(workers: int):
+    """Start, resize or (with ``workers <= 0``) stop the parse process pool.
+
+    Workers are spawned rather than forked because the checker runs next to
+    the web server threads.
+    """
+    global _parse_pool, _parse_pool_workers
+    workers = max(0, workers)
+    with _parse_pool_lock:
+        if workers == _parse_pool_workers and (_parse_pool is not None or workers == 0):
+            return
+        previous = _parse_pool
+        _parse_pool = None
+        if workers > 0:
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _parse_pool_workers = workers
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def parse_pool_size() -> int:
+    return _parse_pool_workers if _parse_pool is not None else 0
+
+
+def extract_vps_info_pooled(html: str) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """``extract_vps_info`` on the parse pool, in-thread when there is none."""
+    global _parse_pool
+    pool = _parse_pool
+    if pool is None:
+        return extract_vps_info(html)
+    try:
+        return pool.submit(extract_vps_info, html).result()
+    except BrokenProcessPool:
+        with _parse_pool_lock:
+            if _parse_pool is pool:
+                _parse_pool = None
+        return extract_vps_info(html)
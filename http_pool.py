@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import logging
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family, create_connection
+from urllib3.util.ssl_ import is_ipaddress
+
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_DNS_TTL = 300
+DNS_CACHE_MAX_ENTRIES = 256
+
+_settings: Dict[str, int] = {
+    'pool_size': DEFAULT_POOL_SIZE,
+    'idle_timeout': DEFAULT_IDLE_TIMEOUT,
+    'dns_ttl': DEFAULT_DNS_TTL,
+}
+
+_sessions_lock = threading.Lock()
+_sessions: Dict[str, Dict[str, Any]] = {}
+
+_dns_lock = threading.Lock()
+_dns_cache: Dict[Tuple[str, int, int], Tuple[float, List[str]]] = {}
+
+
+def _resolve(host: str, port: int) -> Optional[List[str]]:
+    """Addresses for ``host`` from the cache, or ``None`` to let urllib3 resolve it."""
+    ttl = _settings['dns_ttl']
+    if ttl <= 0 or not host or is_ipaddress(host):
+        return None
+    key = (host, port, allowed_gai_family())
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return list(cached[1])
+    addresses = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, port, key[2], socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    with _dns_lock:
+        if key not in _dns_cache and len(_dns_cache) >= DNS_CACHE_MAX_ENTRIES:
+            for stale in [k for k, (expires, _) in _dns_cache.items() if expires <= now]:
+                del _dns_cache[stale]
+            if len(_dns_cache) >= DNS_CACHE_MAX_ENTRIES:
+                del _dns_cache[min(_dns_cache, key=lambda k: _dns_cache[k][0])]
+        _dns_cache[key] = (now + ttl, addresses)
+    return list(addresses)
+
+
+def _forget(host: str, port: int):
+    with _dns_lock:
+        _dns_cache.pop((host, port, allowed_gai_family()), None)
+
+
+class _CachedDNSMixin:
+    """Connects through :func:`_resolve` instead of a fresh lookup per connection.
+
+    Only connections opened by the pooled sessions go through the cache;
+    ``socket.getaddrinfo`` is left alone for the rest of the process. TLS
+    still sends SNI and verifies the certificate for the original host.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        addresses = _resolve(host, self.port)
+        if not addresses:
+            return super()._new_conn()
+        extra_kw = {}
+        if self.source_address:
+            extra_kw['source_address'] = self.source_address
+        if self.socket_options:
+            extra_kw['socket_options'] = self.socket_options
+        error = None
+        for address in addresses:
+            try:
+                return create_connection((address, self.port), self.timeout, **extra_kw)
+            except OSError as exc:
+                error = exc
+        # the cached addresses may be stale; look the host up again next time
+        _forget(host, self.port)
+        if isinstance(error, socket.timeout):
+            raise ConnectTimeoutError(self, f'Connection to {self.host} timed out. (connect timeout={self.timeout})')
+        raise NewConnectionError(self, f'Failed to establish a new connection: {error}')
+
+
+class _CachedDNSHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+def _to_int(raw, default: int, minimum: int = 0) -> int:
+    if raw is None or str(raw).strip() == '':
+        return default
+    try:
+        value = int(str(raw).strip())
+    except (TypeError, ValueError):
+        logger.warning('Ignoring invalid [http] value: %r', raw)
+        return default
+    return value if value >= minimum else default
+
+
+def configure(section: Optional[Dict[str, str]] = None):
+    """Apply the ``[http]`` section of config.ini to the session pool.
+
+    Changing ``pool_size`` closes the existing sessions so that the next
+    request builds adapters with the new size.
+    """
+    section = section or {}
+    pool_size = _to_int(section.get('pool_size'), DEFAULT_POOL_SIZE, minimum=1)
+    idle_timeout = _to_int(section.get('idle_timeout'), DEFAULT_IDLE_TIMEOUT)
+    dns_ttl = _to_int(section.get('dns_ttl'), DEFAULT_DNS_TTL)
+    resize = pool_size != _settings['pool_size']
+    _settings.update({'pool_size': pool_size, 'idle_timeout': idle_timeout, 'dns_ttl': dns_ttl})
+    if dns_ttl <= 0:
+        with _dns_lock:
+            _dns_cache.clear()
+    if resize:
+        close_all()
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CachedDNSHTTPConnectionPool,
+            'https': _CachedDNSHTTPSConnectionPool,
+        }
+
+
+def _build_session() -> requests.Session:
+    """A keep-alive session that never stores or replays cookies.
+
+    Sessions are shared by every account of a provider, and each request
+    carries its own account's ``Cookie`` header; a session-wide jar would
+    pick up one account's ``Set-Cookie`` and send it for another account
+    on redirects, where requests drops the explicit header.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    pool_size = _settings['pool_size']
+    adapter = _PooledAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _evict_idle(now: float):
+    idle_timeout = _settings['idle_timeout']
+    if idle_timeout <= 0:
+        return
+    stale = [key for key, slot in _sessions.items() if now - slot['last_used'] > idle_timeout]
+    for key in stale:
+        slot = _sessions.pop(key)
+        try:
+            slot['session'].close()
+        except Exception:
+            logger.debug('Failed to close idle session %s', key)
+        logger.debug('Evicted idle HTTP session for %s', key)
+
+
+def get_session(key: str) -> requests.Session:
+    """Return the keep-alive session shared by every request to ``key``."""
+    now = time.monotonic()
+    with _sessions_lock:
+        _evict_idle(now)
+        slot = _sessions.get(key)
+        if slot is None:
+            slot = {'session': _build_session(), 'last_used': now}
+            _sessions[key] = slot
+        slot['last_used'] = now
+        return slot['session']
+
+
+def close_all():
+    with _sessions_lock:
+        slots = list(_sessions.values())
+        _sessions.clear()
+    for slot in slots:
+        try:
+            slot['session'].close()
+        except Exception:
+            pass
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from bottle import route, run, template, debug, request, static_file, response
 from add import *
-from sql import fetch_pending_pwa_notifications, mark_pwa_notifications_delivered
+from sql import mark_pwa_notifications_delivered
 import logging
 import threading, time, sys, signal
+import gzip, json
+import wsgi_server
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -20,7 +22,8 @@ def check_vps():
     while not should_stop_checking:
         CheckVPS()
         checkDateTime()
-        time.sleep(10) # 每隔60秒执行一次
+        # 最多每隔10秒执行一次, 有VPS到达检测时间或修改了cookie则提前
+        wait_for_due_checks(10)
         
 # 正常结束进程
 def signal_handler(sig, frame):
@@ -34,7 +37,6 @@ def thread_check(signal_handler):
     t1 = threading.Thread(target=check_vps)
     t1.start()
 
-thread_check(signal_handler)
 
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_ROOT = BASE_DIR / 'static'
@@ -55,7 +57,97 @@ def no_store(resp):
     return resp
 
 
-debug(True)
+# data_version() 在进程重启后从 0 开始, ETag 需带上启动标识
+BOOT_ID = format(int(time.time() * 1000), 'x')
+GZIP_MIN_BYTES = 512
+GZIP_CACHE_SIZE = 32
+_gzip_cache_lock = threading.Lock()
+_gzip_cache = {}
+
+
+PWA_LONG_POLL_MAX_SECONDS = 30
+PWA_FETCH_MAX_LIMIT = 100
+SSE_RETRY_MS = 5000
+# 实时推送名额用完时, 让浏览器隔多久再重连 (期间页面回退为定时轮询)
+SSE_BUSY_RETRY_MS = 60000
+# 长轮询名额用完时, 建议页面隔多久再来领取通知 (秒)
+PWA_BUSY_RETRY_SECONDS = 60
+SSE_KEEPALIVE_SECONDS = 15
+# 单个连接最长保持时间, 到期后浏览器会带 Last-Event-ID 自动重连
+SSE_STREAM_SECONDS = 300
+
+
+def data_etag(version, scope=None):
+    # scope 区分同一数据版本下的不同资源, 如 /sel_id 的监控 ID
+    if scope is None:
+        return f'"{BOOT_ID}-{version}"'
+    return f'"{BOOT_ID}-{version}-{scope}"'
+
+
+def accepts_gzip():
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        if coding.strip().lower() not in ('gzip', '*'):
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+def etag_matches(etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
+
+
+def _gzip_body(key, data):
+    with _gzip_cache_lock:
+        cached = _gzip_cache.get(key)
+    if cached is not None:
+        return cached
+    compressed = gzip.compress(data, compresslevel=6)
+    with _gzip_cache_lock:
+        if len(_gzip_cache) >= GZIP_CACHE_SIZE:
+            _gzip_cache.clear()
+        _gzip_cache[key] = compressed
+    return compressed
+
+
+def revalidated_json(body, etag):
+    """Send a JSON body with a strong ETag, 304 and gzip support.
+
+    ``etag`` must identify ``body`` on its own, whatever the request's
+    method, query or form: the gzip variant gets its own ``-gz`` tag and
+    the compressed bytes are kept per (path, tag).
+    """
+    response.content_type = 'application/json'
+    response.set_header('Cache-Control', 'no-cache')
+    response.set_header('Vary', 'Accept-Encoding')
+    data = body.encode('utf-8')
+    use_gzip = len(data) >= GZIP_MIN_BYTES and accepts_gzip()
+    if use_gzip:
+        etag = etag[:-1] + '-gz"'
+    response.set_header('ETag', etag)
+    if request.method in ('GET', 'HEAD') and etag_matches(etag):
+        response.status = 304
+        return ''
+    if use_gzip:
+        response.set_header('Content-Encoding', 'gzip')
+        return _gzip_body((request.path, etag), data)
+    return data
+
+
 @route('/')
 def home():
     return template('tpl/home.tpl')
@@ -98,7 +190,125 @@ def add():
     return {'message':'添加成功'}
 @route('/select')
 def select():
-    return selectAllInfo_Info()
+    version, _, body = get_dashboard_snapshot()
+    return revalidated_json(body, data_etag(version))
+def _sse_message(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def _dashboard_snapshot_event(log, cursor):
+    _, payload, _ = get_dashboard_snapshot()
+    return _sse_message(log.event_id(cursor), 'snapshot', {'msg': payload.get('msg') or []})
+
+
+def _event_stream(last_event_id):
+    log = get_event_log()
+    cursor = log.resume_cursor(last_event_id)
+    yield f'retry: {SSE_RETRY_MS}\n\n'
+    if cursor is None:
+        # 无法续传: 先记下游标再取快照, 之后的增量重复应用也不会出错
+        cursor = log.cursor()
+        yield _dashboard_snapshot_event(log, cursor)
+    deadline = time.monotonic() + SSE_STREAM_SECONDS
+    while not should_stop_checking and time.monotonic() < deadline:
+        cursor, pending = log.wait(cursor, SSE_KEEPALIVE_SECONDS)
+        if pending is None:
+            yield _dashboard_snapshot_event(log, cursor)
+        elif not pending:
+            yield ': keepalive\n\n'
+        else:
+            for event_id, event_type, data in pending:
+                yield _sse_message(event_id, event_type, data)
+
+
+def _claim_stream_slot():
+    # 长连接 (实时推送 / 长轮询) 只能占用 [server] stream_workers 个名额, 返回释放函数; 名额已满时返回 None
+    # wsgiref 单线程模式没有名额: 一个长连接就会阻塞所有请求, 一律拒绝
+    slots = request.environ.get(wsgi_server.STREAM_SLOTS_ENVIRON)
+    if slots is None or not slots.try_acquire():
+        return None
+    return slots.release
+
+
+def _release_after(stream, release):
+    try:
+        yield from stream
+    finally:
+        release()
+
+
+@route('/events')
+def events():
+    response.content_type = 'text/event-stream; charset=utf-8'
+    response.set_header('Cache-Control', 'no-cache')
+    response.set_header('X-Accel-Buffering', 'no')
+    release = _claim_stream_slot()
+    if release is None:
+        return f'retry: {SSE_BUSY_RETRY_MS}\n\n'
+    last_event_id = request.headers.get('Last-Event-ID') or request.query.get('lastEventId')
+    return _release_after(_event_stream(last_event_id), release)
+
+
+def _query_number(name, default, minimum, maximum):
+    raw = request.query.get(name)
+    try:
+        value = float(raw) if raw not in (None, '') else default
+    except ValueError:
+        value = default
+    return min(max(value, minimum), maximum)
+
+
+# 只读的检测统计: 检测耗时、限速等待与降速次数、熔断状态等
+@route('/metrics', method='GET')
+def metrics():
+    response.content_type = 'application/json'
+    response.set_header('Cache-Control', 'no-store')
+    return json.dumps(get_check_metrics(), default=str)
+
+
+@route('/notifications/pwa/pending', method='GET')
+def pwa_pending():
+    response.set_header('Cache-Control', 'no-store')
+    client_id = (request.query.get('client') or request.remote_addr or 'anonymous')[:64]
+    limit = int(_query_number('limit', 20, 1, PWA_FETCH_MAX_LIMIT))
+    wait = _query_number('wait', 0, 0, PWA_LONG_POLL_MAX_SECONDS)
+    release = _claim_stream_slot() if wait > 0 else None
+    if release is None:
+        if wait > 0:
+            # 没有挂起请求: 告诉页面按普通间隔轮询, 而不是立刻再来
+            response.set_header('Retry-After', str(PWA_BUSY_RETRY_SECONDS))
+        wait = 0
+    try:
+        notifications = wait_for_pwa_notifications(client_id, limit, wait)
+    except Exception:
+        logger.exception('Failed to claim pending PWA notifications for %s', client_id)
+        response.status = 500
+        return {'notifications': [], 'error': '加载通知失败。'}
+    finally:
+        if release is not None:
+            release()
+    return {'notifications': notifications, 'waited': wait > 0}
+
+
+@route('/notifications/pwa/ack', method='POST')
+def pwa_ack():
+    try:
+        payload = request.json
+    except ValueError:
+        payload = None
+    ids = payload.get('ids') if isinstance(payload, dict) else None
+    if not isinstance(ids, list):
+        response.status = 400
+        return {'acknowledged': 0, 'error': '缺少通知 ID 列表。'}
+    try:
+        acknowledged = mark_pwa_notifications_delivered(ids)
+    except Exception:
+        logger.exception('Failed to acknowledge PWA notifications %s', ids)
+        response.status = 500
+        return {'acknowledged': 0, 'error': '确认通知失败。'}
+    return {'acknowledged': acknowledged}
+
+
 @route('/del', method='POST')
 def delete_monitor():
     payload = deleteVPS(request.forms.get('id'))
@@ -122,10 +332,9 @@ def update_monitor():
 @route('/checkPwd', method = 'POST')
 def checkPwd():
     try:
-        res = conf('password')
-        Password = res['password']
+        Password = get_config().password()
         pwd = request.forms.get('pwd')
-        if pwd == Password:
+        if Password is not None and pwd == Password:
             return {'msg': 'success'}
         else:
             return {'msg': 'reject'}
@@ -133,9 +342,9 @@ def checkPwd():
         print(conf('password'))
         print(request.forms.get('pwd'))
         print('error')
-@route('/sel_id', method='POST')
+@route('/sel_id', method=['GET', 'POST'])
 def sel_Id():
-    raw_id = request.forms.get('id')
+    raw_id = request.params.get('id')
     raw_id_text = '' if raw_id is None else str(raw_id).strip()
     client_ip = request.remote_addr or '-'
 
@@ -151,6 +360,7 @@ def sel_Id():
         response.status = 400
         return {'msg': None, 'error': '监控 ID 格式不正确。'}
 
+    version = data_version()
     try:
         payload = selectVPSForId(monitor_id)
     except Exception:
@@ -170,20 +380,30 @@ def sel_Id():
         return {'msg': [], 'error': '未找到监控信息。'}
 
     response.status = 200
-    return payload
+    return revalidated_json(json.dumps(payload), data_etag(version, monitor_id))
 # run(host='localhost', port=8080, reloader=True, server='wsgiref')
 
 
-cf = conf('prot')
-# print(cf)
-if cf == None:
-        print('配置文件读取失败')
-        sys.exit(0)
-else:
-    if cf['port'] != '':
-            run(host='::', port=cf['port'], server='wsgiref')
+if __name__ == '__main__':
+    configure_storage(conf('database'))
+    init_db()
+    thread_check(signal_handler)
+    cf = conf('prot')
+    # print(cf)
+    if cf == None:
+            print('配置文件读取失败')
+            sys.exit(0)
     else:
-        print('配置文件读取不正确')
+        if get_config().port() is not None:
+                # [server] 段: threaded 为多线程生产模式, wsgiref 为单线程调试模式
+                server_settings = wsgi_server.read_settings(conf('server'))
+                debug(server_settings.pop('debug'))
+                if server_settings.pop('mode') == 'wsgiref':
+                    run(host='::', port=get_config().port(), server='wsgiref')
+                else:
+                    run(host='::', port=get_config().port(), server=wsgi_server.ThreadedServerAdapter, **server_settings)
+        else:
+            print('配置文件读取不正确')
 
 # 后台运行
 # nohup python3 -u main.py > monitor.log 2>&1 &
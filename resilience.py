@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker shared by every check of one provider.
+
+    ``failure_threshold`` consecutive failures open the circuit. After
+    ``open_seconds`` it lets through at most ``half_open_probes`` requests;
+    the circuit closes once that many probes succeed and reopens on the
+    first failed probe.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, open_seconds: float = 60, half_open_probes: int = 2):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._rejected = 0
+        self._times_opened = 0
+
+    def configure(self, failure_threshold: int, open_seconds: float, half_open_probes: int):
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.open_seconds = open_seconds
+            self.half_open_probes = half_open_probes
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            return self._state
+
+    def _refresh_state(self, now: float):
+        if self._state == BREAKER_OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = BREAKER_HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _open(self, now: float):
+        self._state = BREAKER_OPEN
+        self._opened_at = now
+        self._failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._times_opened += 1
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            if self._state == BREAKER_CLOSED:
+                return True
+            if self._state == BREAKER_HALF_OPEN and self._probes_in_flight + self._probe_successes < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == BREAKER_HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._state = BREAKER_CLOSED
+                    self._failures = 0
+                return
+            self._failures = 0
+
+    def release(self):
+        """Give back a half-open probe slot without judging the provider."""
+        with self._lock:
+            if self._state == BREAKER_HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == BREAKER_HALF_OPEN:
+                self._open(now)
+                return
+            if self._state == BREAKER_OPEN:
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'rejected': self._rejected,
+                'times_opened': self._times_opened,
+            }
+
+
+class TokenBucket:
+    """Token-bucket request governor with adaptive back-off.
+
+    ``rate`` tokens per second accrue up to ``burst``. Callers reserve a
+    token with :meth:`acquire`; a reservation may drive the bucket negative,
+    which makes later callers wait their turn. :meth:`penalize` halves the
+    effective rate (and honours ``Retry-After``) when the provider pushes
+    back, and every :meth:`reward` recovers a slice of the configured rate.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, min_rate: float = 0.05, recovery_step: float = 0.05):
+        self.name = name
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._deferred = 0
+        self._throttle_events = 0
+
+    def configure(self, rate: float, burst: int):
+        with self._lock:
+            self._refill(time.monotonic())
+            if rate != self.configured_rate:
+                self.configured_rate = rate
+                self.rate = rate
+            self.burst = burst
+            self._tokens = min(self._tokens, float(burst))
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if elapsed > 0 and self.rate > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+
+    def acquire(self, max_wait: float) -> Optional[float]:
+        """Take a token, sleeping for it if that takes at most ``max_wait``.
+
+        Returns the seconds spent waiting, or ``None`` without taking a token
+        when the wait would be longer; the caller should try again later.
+        """
+        if self.configured_rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 1:
+                wait = max(wait, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                self._deferred += 1
+                return None
+            self._tokens -= 1
+            self._acquired += 1
+            if wait > 0:
+                self._waits += 1
+                self._wait_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def delay_hint(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 1 and self.rate > 0:
+                wait = max(wait, (1 - self._tokens) / self.rate)
+            return wait
+
+    def penalize(self, retry_after: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._throttle_events += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after and retry_after > 0:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def reward(self):
+        with self._lock:
+            if self.rate < self.configured_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.configured_rate, self.rate + self.configured_rate * self.recovery_step)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'configured_rate': self.configured_rate,
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': self._tokens,
+                'blocked_for': max(0.0, self._blocked_until - now),
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'wait_seconds': self._wait_seconds,
+                'deferred': self._deferred,
+                'throttle_events': self._throttle_events,
+            }
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    Callers that arrive while a call for the same key is running wait for
+    it and receive its result or exception. Successful results are also
+    kept for ``ttl`` seconds so that later callers reuse them.
+    """
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._flights: Dict[Any, _Flight] = {}
+        self._results: Dict[Any, Tuple[float, Any]] = {}
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key, fn: Callable[[], Any]):
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._shared += 1
+                return cached[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._executed += 1
+            else:
+                self._shared += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self._results.items() if expires <= now]:
+                    del self._results[stale]
+                if flight.error is None and self.ttl > 0:
+                    self._results[key] = (now + self.ttl, flight.value)
+            flight.event.set()
+        return flight.value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'executed': self._executed,
+                'shared': self._shared,
+                'cached': len(self._results),
+            }
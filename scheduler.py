@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class CheckScheduler:
+    """Priority queue of per-VPS check deadlines.
+
+    Deadlines are ``time.monotonic()`` values. Rescheduling an id leaves the
+    old heap entry behind; it is skipped when popped because it no longer
+    matches ``_deadlines``.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __contains__(self, vps_id: int) -> bool:
+        with self._lock:
+            return vps_id in self._deadlines
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._deadlines)
+
+    def schedule(self, vps_id: int, due: float):
+        with self._lock:
+            self._deadlines[vps_id] = due
+            heapq.heappush(self._heap, (due, next(self._counter), vps_id))
+
+    def discard(self, vps_id: int):
+        with self._lock:
+            self._deadlines.pop(vps_id, None)
+
+    def retain(self, active_ids: Iterable[int]):
+        keep = set(active_ids)
+        with self._lock:
+            for vps_id in [vid for vid in self._deadlines if vid not in keep]:
+                self._deadlines.pop(vps_id, None)
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        now = time.monotonic() if now is None else now
+        due_ids = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, _, vps_id = heapq.heappop(self._heap)
+                if self._deadlines.get(vps_id) != due:
+                    continue
+                del self._deadlines[vps_id]
+                due_ids.append(vps_id)
+        return due_ids
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - now)
+
+
+class ReminderScheduler(CheckScheduler):
+    """Min-heap of expiry reminder fire times.
+
+    Keys are ``(vps_id, kind)`` and deadlines are ``time.time()`` values,
+    since reminders are anchored to expiry timestamps rather than to the
+    checker's own clock.
+    """
+
+    def discard_vps(self, vps_id: int):
+        with self._lock:
+            for key in [key for key in self._deadlines if key[0] == vps_id]:
+                self._deadlines.pop(key, None)
+
+    def retain(self, active_ids: Iterable[int]):
+        keep = set(active_ids)
+        with self._lock:
+            for key in [key for key in self._deadlines if key[0] not in keep]:
+                self._deadlines.pop(key, None)
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[int, str]]:
+        return super().pop_due(time.time() if now is None else now)
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        return super().seconds_until_next(time.time() if now is None else now)
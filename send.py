@@ -1,72 +1,81 @@
 # -*- coding: utf-8 -*-
-import configparser, requests, smtplib, datetime
+import smtplib, datetime
 from email.mime.text import MIMEText
 from email.utils import formataddr
+from config_service import get_config
+from http_pool import get_session
 from sql import addSend, selectSend
 
+# 同一监控两次 TG 推送的最小间隔
+TG_SEND_INTERVAL = datetime.timedelta(minutes=30)
+
 def conf(s_name):
-    config = configparser.ConfigParser()
-    try:
-        with open('config.ini', 'r', encoding='utf-8') as f:
-            config.read_file(f)
-        list = {}
-        for k,v in config.items(s_name):
-            list.update({k: v})
-        return list
-    except:
-        return None
+    # 读取缓存的配置, config.ini 修改后自动重新加载
+    return get_config().section(s_name)
     
 def sendMsg(m_id, msg, mode):
-    options = conf('options')
+    options = get_config().options()
     if options == None:
         print('配置文件读取失败')
     else:
-        if options['tgbot'] == '1' and options['email'] == '0':
+        if options['tgbot'] is True and options['email'] is False:
             tg(m_id, msg, mode)
-        elif options['tgbot'] == '0' and options['email'] == '1':
+        elif options['tgbot'] is False and options['email'] is True:
             mail(m_id, msg)
-        elif options['tgbot'] == '1' and options['email'] == '1':
+        elif options['tgbot'] is True and options['email'] is True:
             tg(m_id, msg, mode)
             mail(m_id, msg)
         else:
             print('配置文件读取不正确')
     
+def tg_retry_delay(m_id):
+    # 距离 tg() 再次允许推送还需等待的时间, 无需等待则返回 None
+    options = get_config().options()
+    if options == None or options['tgbot'] is not True:
+        return None
+    res = selectSend(m_id, 1)
+    if len(res) == 0:
+        return None
+    last = datetime.datetime.strptime(res[0][4], '%Y-%m-%d %H:%M:%S')
+    delay = last + TG_SEND_INTERVAL + datetime.timedelta(seconds=1) - datetime.datetime.now()
+    return delay if delay > datetime.timedelta(0) else None
+
 def tg(m_id, msg, mode):
     try:
         res = selectSend(m_id, 1)
         if len(res) == 0:
-            item = conf('tgbot_info')
+            item = get_config().tgbot_info()
             bot_token = item['tgbot_token']
-            chat_ids = item['chat_ids'].split(',')
+            chat_ids = item['chat_ids']
             url = f'https://api.telegram.org/bot{bot_token}'
             try:
-                for chat_id in list(set(chat_ids)):
+                for chat_id in chat_ids:
                     data = {
                         'chat_id' : chat_id,
                         'text': msg,
                         'parse_mode': mode
                     }
-                    resp = requests.post(f"{url}/sendMessage", data=data)
+                    resp = get_session('telegram').post(f"{url}/sendMessage", data=data)
                     addSend(m_id, msg, 1)
                     print(resp.json())
 
             except:
                 print('TGbot接口请求失败,发送失败')
         else:
-            if (datetime.datetime.now() - datetime.datetime.strptime(res[0][4], '%Y-%m-%d %H:%M:%S')) > datetime.timedelta(minutes=30):
-                item = conf('tgbot_info')
+            if (datetime.datetime.now() - datetime.datetime.strptime(res[0][4], '%Y-%m-%d %H:%M:%S')) > TG_SEND_INTERVAL:
+                item = get_config().tgbot_info()
                 bot_token = item['tgbot_token']
-                chat_ids = item['chat_ids'].split(',')
+                chat_ids = item['chat_ids']
                 url = f'https://api.telegram.org/bot{bot_token}'
                 try:
-                    for chat_id in list(set(chat_ids)):
+                    for chat_id in chat_ids:
                         data = {
                             'chat_id' : chat_id,
                             'text': msg,
                             'parse_mode': mode
 
                         }
-                        resp = requests.post(f"{url}/sendMessage", data=data)
+                        resp = get_session('telegram').post(f"{url}/sendMessage", data=data)
                         addSend(m_id, msg, 1)
                         print(resp.json())
 
@@ -80,8 +89,8 @@ def mail(m_id, msg):
     try:
         res = selectSend(m_id, 2)
         if len(res) == 0:
-            ei = conf('email_info')
-            for r_email in ei['receiver_email'].split(','):
+            ei = get_config().email_info()
+            for r_email in ei['receiver_email']:
                 message = MIMEText(msg, 'plain', 'utf-8')
                 message['From'] = formataddr(('AUXBot', ei['sender_email']))
                 message['To'] = formataddr(('告警用户',r_email))
@@ -101,8 +110,8 @@ def mail(m_id, msg):
                     print(f'通知邮件发送失败,错误信息{e}')
         else:
             if (datetime.datetime.now() - datetime.datetime.strptime(res[0][4], '%Y-%m-%d %H:%M:%S')) > datetime.timedelta(hours=8):
-                ei = conf('email_info')
-                for r_email in ei['receiver_email'].split(','):
+                ei = get_config().email_info()
+                for r_email in ei['receiver_email']:
                     message = MIMEText(msg, 'plain', 'utf-8')
                     message['From'] = formataddr(('AUXBot', ei['sender_email']))
                     message['To'] = formataddr(('告警用户',r_email))
@@ -1,4 +1,4 @@
-const VERSION = 'pwa-v1.4.0';
+const VERSION = 'pwa-v1.7.1';
 const PRECACHE = `precache-${VERSION}`;
 const RUNTIME = `runtime-${VERSION}`;
 
@@ -26,6 +26,7 @@ const PRECACHE_URLS = [
 const NOTIFICATION_SYNC_TAG = 'vps-expiry-sync';
 const PWA_NOTIFICATION_ENDPOINT = '/notifications/pwa/pending';
 const PWA_NOTIFICATION_ACK_ENDPOINT = '/notifications/pwa/ack';
+const NOTIFICATION_CLIENT_ID = 'service-worker';
 
 self.addEventListener('install', (event) => {
   event.waitUntil(
@@ -77,6 +78,32 @@ async function networkFirst(request, fallbackUrl) {
   }
 }
 
+async function revalidatingNetworkFirst(request) {
+  const cache = await caches.open(RUNTIME);
+  const cached = await cache.match(request);
+  let networkRequest = request;
+  if (cached && !request.headers.has('If-None-Match')) {
+    const etag = cached.headers.get('ETag');
+    if (etag) {
+      const headers = new Headers(request.headers);
+      headers.set('If-None-Match', etag);
+      networkRequest = new Request(request, { headers, cache: 'no-store' });
+    }
+  }
+  try {
+    const response = await fetch(networkRequest);
+    if (response.status === 304 && networkRequest !== request) {
+      return cached;
+    }
+    return stashRuntimeResponse(request, response);
+  } catch (error) {
+    if (cached) {
+      return cached;
+    }
+    throw error;
+  }
+}
+
 async function staleWhileRevalidate(request) {
   const cache = await caches.open(RUNTIME);
   const cached = await cache.match(request);
@@ -92,7 +119,7 @@ async function staleWhileRevalidate(request) {
 }
 
 async function fetchPendingNotificationsFromServer() {
-  const response = await fetch(PWA_NOTIFICATION_ENDPOINT, {
+  const response = await fetch(`${PWA_NOTIFICATION_ENDPOINT}?client=${NOTIFICATION_CLIENT_ID}`, {
     credentials: 'same-origin',
     cache: 'no-store',
     headers: { Accept: 'application/json' },
@@ -178,7 +205,18 @@ self.addEventListener('fetch', (event) => {
   }
 
   if (url.pathname === '/select') {
-    event.respondWith(networkFirst(request));
+    event.respondWith(revalidatingNetworkFirst(request));
+    return;
+  }
+
+  if (url.pathname === '/events') {
+    // long-lived event stream: leave it to the browser, never cache it
+    return;
+  }
+
+  if (url.pathname === '/sel_id') {
+    // carries the account cookie: revalidated by the page, never cached here
+    event.respondWith(fetch(request));
     return;
   }
 
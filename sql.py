@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import datetime
 import json
-import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 
 import pytz
 
+from db_pool import ConnectionPool, PooledConnection
+
 DB_PATH = 'monitor.db'
 PENDING_STATE = 2
 
@@ -31,18 +35,235 @@ DATETIME_PATTERNS = (
     '%b %d, %Y %I:%M %p',
 )
 
-_EXPIRY_BACKFILL_DONE = False
+DB_CACHED_STATEMENTS = 256
+DB_POOL_MAX_IDLE = 8
+DB_JOURNAL_MODES = ('wal', 'delete', 'truncate', 'persist')
+DB_SYNCHRONOUS_MODES = ('off', 'normal', 'full')
+DB_JOURNAL_MODE = 'wal'
+DB_SYNCHRONOUS = 'normal'
+DB_BUSY_TIMEOUT = 5000
+DB_CACHE_SIZE = -8192
+DB_CHECKPOINT_INTERVAL = 300
+DB_JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+SEND_RETENTION_DAYS = 90
+SEND_MAX_ROWS = 10000
+PWA_ARCHIVE_DAYS = 7
+PWA_RETENTION_DAYS = 90
+HISTORY_COMPACT_INTERVAL = 3600
+PWA_LEASE_SECONDS = 60
+HISTORY_COMPACT_BATCH = 500
+EXPIRY_CACHE_SIZE = 2048
 
+VPS_CHECK_COLUMNS = (
+    'creation_date',
+    'valid_until',
+    'location',
+    'ipv6',
+    'ram',
+    'disk_total',
+    'update_time',
+    'state',
+    'expiry_utc',
+)
+WRITE_BUFFER_MAX_ROWS = 100
+WRITE_BUFFER_MAX_AGE = 5.0
 
-def connSqlite():
-    conn = sqlite3.connect(DB_PATH)
+_write_buffer_lock = threading.Lock()
+_write_flush_lock = threading.Lock()
+_write_buffer = {}
+_write_buffer_started = None
+_write_buffer_settings = {'max_rows': WRITE_BUFFER_MAX_ROWS, 'max_age': WRITE_BUFFER_MAX_AGE}
+_write_stats = {'flushes': 0, 'rows_buffered': 0, 'rows_written': 0, 'rows_unchanged': 0}
+
+_data_version_lock = threading.Lock()
+_data_version = 0
+
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+_storage_settings = {
+    'journal_mode': DB_JOURNAL_MODE,
+    'synchronous': DB_SYNCHRONOUS,
+    'busy_timeout': DB_BUSY_TIMEOUT,
+    'cache_size': DB_CACHE_SIZE,
+    'checkpoint_interval': DB_CHECKPOINT_INTERVAL,
+}
+_checkpoint_lock = threading.Lock()
+_last_checkpoint = time.monotonic()
+_checkpoint_stats = {'checkpoints': 0, 'busy': 0, 'wal_pages': 0, 'checkpointed_pages': 0}
+_retention_settings = {
+    'send_retention_days': SEND_RETENTION_DAYS,
+    'send_max_rows': SEND_MAX_ROWS,
+    'pwa_archive_days': PWA_ARCHIVE_DAYS,
+    'pwa_retention_days': PWA_RETENTION_DAYS,
+    'compact_interval': HISTORY_COMPACT_INTERVAL,
+}
+_compact_lock = threading.Lock()
+_last_compact = None
+_compact_stats = {'compactions': 0, 'send_rows_deleted': 0, 'pwa_archived': 0, 'pwa_purged': 0}
+
+
+def data_version():
+    """Counter bumped after every committed change to the ``vps`` table."""
+    return _data_version
+
+
+def _bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+
+def _open_connection():
+    settings = _storage_settings
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=settings['busy_timeout'] / 1000,
+        check_same_thread=False,
+        cached_statements=DB_CACHED_STATEMENTS,
+        factory=PooledConnection,
+    )
     conn.row_factory = sqlite3.Row
-    _ensure_schema(conn)
+    conn.execute(f"PRAGMA busy_timeout={int(settings['busy_timeout'])}")
+    conn.execute(f"PRAGMA synchronous={settings['synchronous'].upper()}")
+    conn.execute(f"PRAGMA cache_size={int(settings['cache_size'])}")
+    conn.execute(f'PRAGMA journal_size_limit={DB_JOURNAL_SIZE_LIMIT}')
     return conn
 
 
+def _read_storage_int(section, key, default, minimum=None):
+    raw = section.get(key)
+    if raw is None or str(raw).strip() == '':
+        return default
+    try:
+        value = int(str(raw).strip())
+    except (TypeError, ValueError):
+        return default
+    if minimum is not None and value < minimum:
+        return default
+    return value
+
+
+def _read_storage_choice(section, key, default, choices):
+    raw = section.get(key)
+    value = str(raw).strip().lower() if raw is not None else ''
+    return value if value in choices else default
+
+
+def configure_storage(section=None):
+    """Apply the ``[database]`` section of config.ini.
+
+    Connection pragmas only apply to newly opened connections, so a change
+    retires the pooled ones; the journal mode is stored in the database file
+    and is switched on the spot once the schema exists.
+    """
+    section = section or {}
+    _retention_settings.update({
+        'send_retention_days': _read_storage_int(section, 'send_retention_days', SEND_RETENTION_DAYS, minimum=0),
+        'send_max_rows': _read_storage_int(section, 'send_max_rows', SEND_MAX_ROWS, minimum=0),
+        'pwa_archive_days': _read_storage_int(section, 'pwa_archive_days', PWA_ARCHIVE_DAYS, minimum=0),
+        'pwa_retention_days': _read_storage_int(section, 'pwa_retention_days', PWA_RETENTION_DAYS, minimum=0),
+        'compact_interval': _read_storage_int(section, 'compact_interval', HISTORY_COMPACT_INTERVAL, minimum=0),
+    })
+    settings = {
+        'journal_mode': _read_storage_choice(section, 'journal_mode', DB_JOURNAL_MODE, DB_JOURNAL_MODES),
+        'synchronous': _read_storage_choice(section, 'synchronous', DB_SYNCHRONOUS, DB_SYNCHRONOUS_MODES),
+        'busy_timeout': _read_storage_int(section, 'busy_timeout', DB_BUSY_TIMEOUT, minimum=0),
+        'cache_size': _read_storage_int(section, 'cache_size', DB_CACHE_SIZE),
+        'checkpoint_interval': _read_storage_int(section, 'checkpoint_interval', DB_CHECKPOINT_INTERVAL, minimum=0),
+    }
+    if settings == _storage_settings:
+        return
+    journal_changed = settings['journal_mode'] != _storage_settings['journal_mode']
+    _storage_settings.update(settings)
+    _db_pool.close_all()
+    if journal_changed and _schema_ready:
+        conn = _db_pool.acquire()
+        try:
+            _apply_journal_mode(conn)
+        finally:
+            conn.close()
+
+
+def _apply_journal_mode(conn):
+    try:
+        row = conn.execute(f"PRAGMA journal_mode={_storage_settings['journal_mode'].upper()}").fetchone()
+    except sqlite3.OperationalError:
+        # another connection holds a lock; the next configure/startup retries
+        return None
+    return row[0] if row is not None else None
+
+
+def checkpoint_db(force=False):
+    """Fold the WAL back into the database every ``checkpoint_interval`` s.
+
+    Uses a PASSIVE checkpoint so readers and the writer are never blocked;
+    pages still needed by an open reader are left for the next run.
+    """
+    global _last_checkpoint
+    if _storage_settings['journal_mode'] != 'wal':
+        return None
+    interval = _storage_settings['checkpoint_interval']
+    now = time.monotonic()
+    with _checkpoint_lock:
+        if not force and (interval <= 0 or now - _last_checkpoint < interval):
+            return None
+        _last_checkpoint = now
+    conn = connSqlite()
+    try:
+        busy, wal_pages, checkpointed = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    finally:
+        conn.close()
+    with _checkpoint_lock:
+        _checkpoint_stats['checkpoints'] += 1
+        _checkpoint_stats['busy'] += 1 if busy else 0
+        _checkpoint_stats['wal_pages'] = wal_pages
+        _checkpoint_stats['checkpointed_pages'] = checkpointed
+    return wal_pages, checkpointed
+
+
+_db_pool = ConnectionPool(_open_connection, max_idle=DB_POOL_MAX_IDLE)
+
+
+def init_db():
+    """Create and migrate the schema once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        conn = _db_pool.acquire()
+        try:
+            _apply_journal_mode(conn)
+            _ensure_schema(conn)
+        finally:
+            conn.close()
+        _schema_ready = True
+
+
+def connSqlite():
+    """Check out a pooled connection; ``conn.close()`` returns it to the pool."""
+    if not _schema_ready:
+        init_db()
+    return _db_pool.acquire()
+
+
+def close_db():
+    _db_pool.close_all()
+
+
+def db_pool_stats():
+    stats = _db_pool.snapshot()
+    stats['journal_mode'] = _storage_settings['journal_mode']
+    with _checkpoint_lock:
+        stats.update(_checkpoint_stats)
+    with _compact_lock:
+        stats.update(_compact_stats)
+    return stats
+
+
 def _ensure_schema(conn):
-    global _EXPIRY_BACKFILL_DONE
     cursor = conn.cursor()
     cursor.execute(
         '''CREATE TABLE IF NOT EXISTS vps
@@ -85,30 +306,102 @@ def _ensure_schema(conn):
                 '''
     )
     cursor.execute(
-        '''CREATE INDEX IF NOT EXISTS idx_pwa_notifications_pending
-                    ON pwa_notifications(delivered_at, scheduled_for)'''
+        '''CREATE TABLE IF NOT EXISTS pwa_notifications_archive
+                    (id INTEGER PRIMARY KEY,
+                    monitor_id INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    options_json TEXT NOT NULL,
+                    scheduled_for TEXT,
+                    delivered_at TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    dedupe_key TEXT UNIQUE,
+                    archived_at TEXT NOT NULL)
+                '''
+    )
+    cursor.execute('DROP INDEX IF EXISTS idx_pwa_notifications_pending')
+    cursor.execute(
+        '''CREATE INDEX IF NOT EXISTS idx_pwa_notifications_due
+                    ON pwa_notifications(scheduled_for, id) WHERE delivered_at IS NULL'''
+    )
+    cursor.execute(
+        '''CREATE INDEX IF NOT EXISTS idx_pwa_notifications_monitor_pending
+                    ON pwa_notifications(monitor_id, type) WHERE delivered_at IS NULL'''
     )
+    cursor.execute(
+        '''CREATE INDEX IF NOT EXISTS idx_pwa_notifications_delivered
+                    ON pwa_notifications(delivered_at) WHERE delivered_at IS NOT NULL'''
+    )
+    cursor.execute(
+        '''CREATE INDEX IF NOT EXISTS idx_pwa_notifications_archive_delivered
+                    ON pwa_notifications_archive(delivered_at)'''
+    )
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_send_monitor_flag_date'")
+    if cursor.fetchone() is None:
+        conn.commit()
+        # trim the history first so the index build holds the write lock briefly
+        _compact_send_history(conn)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_send_monitor_flag_date ON send(monitor_id, flag, date)')
     cursor.execute('PRAGMA table_info(vps)')
     columns = {row[1] for row in cursor.fetchall()}
     if 'expiry_utc' not in columns:
         cursor.execute('ALTER TABLE vps ADD COLUMN expiry_utc TEXT')
+    cursor.execute('PRAGMA table_info(pwa_notifications)')
+    columns = {row[1] for row in cursor.fetchall()}
+    if 'lease_owner' not in columns:
+        cursor.execute('ALTER TABLE pwa_notifications ADD COLUMN lease_owner TEXT')
+    if 'lease_expires_at' not in columns:
+        cursor.execute('ALTER TABLE pwa_notifications ADD COLUMN lease_expires_at TEXT')
     conn.commit()
-    if not _EXPIRY_BACKFILL_DONE:
-        _backfill_expiry_utc(conn)
-        _EXPIRY_BACKFILL_DONE = True
+    _backfill_expiry_utc(conn)
+
+
+_expiry_cache = OrderedDict()
+_expiry_cache_lock = threading.Lock()
+_expiry_cache_stats = {'hits': 0, 'misses': 0}
+# (provider, field) -> pattern that parsed the provider's last value of that field
+_pattern_hints = {}
+# (zone, naive hour) -> the pytz tzinfo that localize() picks for it
+_tzinfo_cache = {}
 
 
-def _parse_date_string(value):
+def _localize(timezone, naive):
+    """``timezone.localize(naive)`` with the chosen offset memoised per hour."""
+    key = (timezone.zone, naive.year, naive.month, naive.day, naive.hour)
+    tzinfo = _tzinfo_cache.get(key)
+    if tzinfo is None:
+        localized = timezone.localize(naive)
+        if len(_tzinfo_cache) >= EXPIRY_CACHE_SIZE:
+            _tzinfo_cache.clear()
+        _tzinfo_cache[key] = localized.tzinfo
+        return localized
+    return naive.replace(tzinfo=tzinfo)
+
+
+def _strptime_first(text, hint_key, patterns):
+    hint = _pattern_hints.get(hint_key)
+    if hint is not None:
+        patterns = (hint,) + tuple(pattern for pattern in patterns if pattern != hint)
+    for pattern in patterns:
+        try:
+            parsed = datetime.datetime.strptime(text, pattern)
+        except ValueError:
+            continue
+        _pattern_hints[hint_key] = pattern
+        return parsed
+    return None
+
+
+def _parse_date_string(value, provider=None):
     if value is None:
         return None
     text = str(value).strip()
     if not text:
         return None
-    for pattern in DATE_PATTERNS:
-        try:
-            return datetime.datetime.strptime(text, pattern).date()
-        except ValueError:
-            continue
+    parsed = _strptime_first(text, (provider, 'date'), DATE_PATTERNS)
+    if parsed is not None:
+        return parsed.date()
     try:
         normalized = text.replace('Z', '+00:00') if 'Z' in text else text
         parsed = datetime.datetime.fromisoformat(normalized)
@@ -117,7 +410,7 @@ def _parse_date_string(value):
         return None
 
 
-def _parse_localized_datetime(value, timezone):
+def _parse_localized_datetime(value, timezone, provider=None, field=None):
     if value is None:
         return None
     text = str(value).strip()
@@ -130,19 +423,13 @@ def _parse_localized_datetime(value, timezone):
         parsed = None
     if parsed is not None:
         if parsed.tzinfo is None:
-            return timezone.localize(parsed)
+            return _localize(timezone, parsed)
         return parsed.astimezone(timezone)
-    for pattern in DATETIME_PATTERNS:
-        try:
-            naive = datetime.datetime.strptime(text, pattern)
-            return timezone.localize(naive)
-        except ValueError:
-            continue
-    date_value = _parse_date_string(text)
-    if date_value is None:
+    # a bare date parses to midnight
+    naive = _strptime_first(text, (provider, field), DATETIME_PATTERNS + DATE_PATTERNS)
+    if naive is None:
         return None
-    naive_midnight = datetime.datetime.combine(date_value, datetime.time.min)
-    return timezone.localize(naive_midnight)
+    return _localize(timezone, naive)
 
 
 def _parse_iso_datetime(value):
@@ -186,24 +473,28 @@ def _normalize_utc_datetime(value):
     return candidate.astimezone(UTC).replace(microsecond=0)
 
 
-def calculate_expiry_utc(creation_value, valid_value):
-    expiry_local = _parse_localized_datetime(valid_value, JAKARTA_TZ)
+def _calculate_expiry_utc(creation_value, valid_value, provider=None):
+    expiry_local = _parse_localized_datetime(valid_value, JAKARTA_TZ, provider, 'valid_until')
     if expiry_local is None:
-        creation_local = _parse_localized_datetime(creation_value, JAKARTA_TZ)
+        creation_local = _parse_localized_datetime(creation_value, JAKARTA_TZ, provider, 'creation_date')
         if creation_local is not None:
             anchor = creation_local.replace(hour=0, minute=0, second=0, microsecond=0)
             expiry_local = JAKARTA_TZ.normalize(anchor + datetime.timedelta(days=5))
         else:
-            creation_date = _parse_date_string(creation_value)
+            creation_date = _parse_date_string(creation_value, provider)
             if creation_date is not None:
                 anchor = datetime.datetime.combine(creation_date, datetime.time.min)
-                localized_anchor = JAKARTA_TZ.localize(anchor)
+                localized_anchor = _localize(JAKARTA_TZ, anchor)
                 expiry_local = JAKARTA_TZ.normalize(localized_anchor + datetime.timedelta(days=5))
     if expiry_local is None:
         return None
     return expiry_local.replace(microsecond=0).astimezone(UTC)
 
 
+def calculate_expiry_utc(creation_value, valid_value, provider=None):
+    return resolve_expiry_values(creation_value, valid_value, None, provider)[0]
+
+
 def format_malaysia_display(expiry_dt_utc):
     if expiry_dt_utc is None:
         return ''
@@ -215,26 +506,67 @@ def format_malaysia_display(expiry_dt_utc):
     return f'{date_part}, {time_part} MYT'
 
 
-def resolve_expiry_values(creation_value, valid_value, expiry_value):
+def _resolve_expiry_uncached(creation_value, valid_value, expiry_value, provider=None):
     expiry_dt = _parse_iso_datetime(expiry_value)
     if expiry_dt is None:
-        expiry_dt = calculate_expiry_utc(creation_value, valid_value)
+        expiry_dt = _calculate_expiry_utc(creation_value, valid_value, provider)
     if expiry_dt is None:
         return None, None, ''
     expiry_utc = expiry_dt.astimezone(UTC).replace(microsecond=0)
     return expiry_utc, expiry_utc.isoformat(), format_malaysia_display(expiry_utc)
 
 
+def resolve_expiry_values(creation_value, valid_value, expiry_value, provider=None):
+    """``(expiry_dt, expiry_iso, MYT display)`` for a row's raw date columns.
+
+    Results are memoised in an LRU of ``EXPIRY_CACHE_SIZE`` entries keyed on
+    the raw strings; they only depend on those strings, so entries never go
+    stale. ``provider`` lets the parser try that provider's last matching
+    format first on a miss.
+    """
+    key = (creation_value, valid_value, expiry_value)
+    try:
+        hash(key)
+    except TypeError:
+        return _resolve_expiry_uncached(creation_value, valid_value, expiry_value, provider)
+    with _expiry_cache_lock:
+        cached = _expiry_cache.get(key)
+        if cached is not None:
+            _expiry_cache.move_to_end(key)
+            _expiry_cache_stats['hits'] += 1
+            return cached
+    result = _resolve_expiry_uncached(creation_value, valid_value, expiry_value, provider)
+    with _expiry_cache_lock:
+        _expiry_cache_stats['misses'] += 1
+        if EXPIRY_CACHE_SIZE > 0:
+            _expiry_cache[key] = result
+            while len(_expiry_cache) > EXPIRY_CACHE_SIZE:
+                _expiry_cache.popitem(last=False)
+    return result
+
+
+def clear_expiry_cache():
+    with _expiry_cache_lock:
+        _expiry_cache.clear()
+        _pattern_hints.clear()
+        _tzinfo_cache.clear()
+
+
+def expiry_cache_stats():
+    with _expiry_cache_lock:
+        return {'size': len(_expiry_cache), 'max_size': EXPIRY_CACHE_SIZE, **_expiry_cache_stats}
+
+
 def _backfill_expiry_utc(conn):
     cursor = conn.cursor()
     try:
-        cursor.execute('SELECT id, creation_date, valid_until, expiry_utc FROM vps')
+        cursor.execute('SELECT id, ops, creation_date, valid_until, expiry_utc FROM vps')
     except sqlite3.OperationalError:
         return
     rows = cursor.fetchall()
     updates = []
     for row in rows:
-        expiry_dt = calculate_expiry_utc(row['creation_date'], row['valid_until'])
+        expiry_dt = calculate_expiry_utc(row['creation_date'], row['valid_until'], row['ops'])
         expiry_iso = expiry_dt.isoformat() if expiry_dt is not None else None
         existing_iso = row['expiry_utc']
         if expiry_iso != existing_iso:
@@ -242,6 +574,7 @@ def _backfill_expiry_utc(conn):
     if updates:
         cursor.executemany('UPDATE vps SET expiry_utc=? WHERE id=?', updates)
         conn.commit()
+        _bump_data_version()
 
 
 def update_expiry_utc(id, expiry_iso):
@@ -251,6 +584,7 @@ def update_expiry_utc(id, expiry_iso):
     cursor = conn.cursor()
     cursor.execute('update vps set expiry_utc=? where id=?', (expiry_iso, id))
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 
@@ -262,6 +596,7 @@ def addSql(name, ops, cookie):
         (name, ops, cookie, PENDING_STATE),
     )
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 
@@ -304,14 +639,143 @@ def updateInfoSql(creation_date, valid_until, location, ipv6, ram, disk_total, i
         ),
     )
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 
+def configure_write_buffer(max_rows=WRITE_BUFFER_MAX_ROWS, max_age=WRITE_BUFFER_MAX_AGE):
+    _write_buffer_settings['max_rows'] = max_rows
+    _write_buffer_settings['max_age'] = max_age
+
+
+def _buffer_vps_write(id, values):
+    global _write_buffer_started
+    with _write_buffer_lock:
+        _write_buffer.setdefault(id, {}).update(values)
+        _write_stats['rows_buffered'] += 1
+        now = time.monotonic()
+        if _write_buffer_started is None:
+            _write_buffer_started = now
+        should_flush = (
+            len(_write_buffer) >= _write_buffer_settings['max_rows']
+            or now - _write_buffer_started >= _write_buffer_settings['max_age']
+        )
+    if should_flush:
+        flush_vps_writes()
+
+
+def buffer_info_update(creation_date, valid_until, location, ipv6, ram, disk_total, id, provider=None):
+    expiry_dt = calculate_expiry_utc(creation_date, valid_until, provider)
+    expiry_iso = expiry_dt.isoformat() if expiry_dt is not None else None
+    _buffer_vps_write(
+        id,
+        {
+            'creation_date': creation_date,
+            'valid_until': valid_until,
+            'location': location,
+            'ipv6': ipv6,
+            'ram': ram,
+            'disk_total': disk_total,
+            'update_time': datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat(),
+            'state': 1,
+            'expiry_utc': expiry_iso,
+        },
+    )
+
+
+def buffer_touch(id):
+    _buffer_vps_write(
+        id,
+        {
+            'update_time': datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat(),
+            'state': 1,
+        },
+    )
+
+
+def buffer_state(state, id):
+    _buffer_vps_write(id, {'state': state})
+
+
+def flush_vps_writes():
+    """Write every buffered checker update in a single transaction.
+
+    Only columns whose value differs from the stored row are written, and
+    rows with nothing to change are skipped. On failure the updates go back
+    into the buffer (behind anything queued since) and the error is raised.
+    """
+    global _write_buffer, _write_buffer_started
+    with _write_flush_lock:
+        with _write_buffer_lock:
+            pending = _write_buffer
+            _write_buffer = {}
+            _write_buffer_started = None
+        if not pending:
+            return 0
+        conn = connSqlite()
+        try:
+            cursor = conn.cursor()
+            ids = list(pending)
+            current = {}
+            columns_sql = ', '.join(VPS_CHECK_COLUMNS)
+            for offset in range(0, len(ids), 500):
+                chunk = ids[offset:offset + 500]
+                placeholders = ','.join('?' for _ in chunk)
+                cursor.execute(f'SELECT id, {columns_sql} FROM vps WHERE id IN ({placeholders})', chunk)
+                for row in cursor.fetchall():
+                    current[row['id']] = row
+            groups = {}
+            unchanged = 0
+            for id, values in pending.items():
+                row = current.get(id)
+                if row is None:
+                    continue
+                changed = {column: value for column, value in values.items() if row[column] != value}
+                if not changed:
+                    unchanged += 1
+                    continue
+                columns = tuple(sorted(changed))
+                groups.setdefault(columns, []).append(tuple(changed[column] for column in columns) + (id,))
+            written = 0
+            for columns, params in groups.items():
+                assignments = ', '.join(f'{column}=?' for column in columns)
+                cursor.executemany(f'UPDATE vps SET {assignments} WHERE id=?', params)
+                written += len(params)
+            conn.commit()
+            if written:
+                _bump_data_version()
+        except Exception:
+            conn.rollback()
+            with _write_buffer_lock:
+                for id, values in pending.items():
+                    merged = dict(values)
+                    merged.update(_write_buffer.get(id, {}))
+                    _write_buffer[id] = merged
+                if _write_buffer_started is None:
+                    _write_buffer_started = time.monotonic()
+            raise
+        finally:
+            conn.close()
+        with _write_buffer_lock:
+            _write_stats['flushes'] += 1
+            _write_stats['rows_written'] += written
+            _write_stats['rows_unchanged'] += unchanged
+        return written
+
+
+def write_buffer_stats():
+    with _write_buffer_lock:
+        stats = dict(_write_stats)
+        stats['pending'] = len(_write_buffer)
+    return stats
+
+
 def updateState(state, id):
     conn = connSqlite()
     exec = conn.cursor()
     exec.execute("update vps set state=? where id=?",(state, id))
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 
@@ -320,6 +784,7 @@ def updateVps(name, ops, cookie, id):
     exec = conn.cursor()
     exec.execute("update vps set name=?, ops=?, cookie=? where id=?",(name, ops, cookie, id))
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 
@@ -329,11 +794,135 @@ def deleteVps(id):
         cursor = conn.cursor()
         cursor.execute("delete from vps where id=?", (id,))
         conn.commit()
+        _bump_data_version()
         return cursor.rowcount
     finally:
         conn.close()
 
 
+def _compact_send_history(conn):
+    """Delete send rows past the age or row-count limit, in short batches.
+
+    The newest row of every ``(monitor_id, flag)`` pair is always kept while
+    its monitor exists, since ``tg``/``mail`` rate-limit against it.
+    """
+    retention_days = _retention_settings['send_retention_days']
+    max_rows = _retention_settings['send_max_rows']
+    if retention_days <= 0 and max_rows <= 0:
+        return 0
+    cursor = conn.cursor()
+    cap_id = 0
+    if max_rows > 0:
+        cursor.execute('SELECT id FROM send ORDER BY id DESC LIMIT 1 OFFSET ?', (max_rows,))
+        row = cursor.fetchone()
+        cap_id = row[0] if row is not None else 0
+    cutoff = ''
+    if retention_days > 0:
+        cursor.execute("SELECT datetime('now', 'localtime', ?)", (f'-{retention_days} days',))
+        cutoff = cursor.fetchone()[0]
+    cursor.execute('DROP TABLE IF EXISTS temp.send_keep')
+    cursor.execute(
+        '''CREATE TEMP TABLE send_keep AS
+               SELECT MAX(id) AS id FROM send
+               WHERE monitor_id IN (SELECT id FROM vps)
+               GROUP BY monitor_id, flag'''
+    )
+    conn.commit()
+    deleted = 0
+    try:
+        while True:
+            cursor.execute(
+                '''DELETE FROM send WHERE id IN (
+                       SELECT id FROM send
+                       WHERE (id <= ? OR date < ?) AND id NOT IN (SELECT id FROM temp.send_keep)
+                       ORDER BY id LIMIT ?)''',
+                (cap_id, cutoff, HISTORY_COMPACT_BATCH),
+            )
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < HISTORY_COMPACT_BATCH:
+                break
+    finally:
+        cursor.execute('DROP TABLE IF EXISTS temp.send_keep')
+        conn.commit()
+    return deleted
+
+
+def _compact_pwa_notifications(conn):
+    """Move old delivered notifications to the archive and purge old archive rows.
+
+    Returns ``(archived, purged)``. Each batch is its own short transaction.
+    """
+    archive_days = _retention_settings['pwa_archive_days']
+    retention_days = _retention_settings['pwa_retention_days']
+    cursor = conn.cursor()
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    archived = 0
+    if archive_days > 0:
+        cutoff = (now - datetime.timedelta(days=archive_days)).isoformat()
+        while True:
+            cursor.execute(
+                '''SELECT id FROM pwa_notifications
+                   WHERE delivered_at IS NOT NULL AND delivered_at < ?
+                   ORDER BY delivered_at LIMIT ?''',
+                (cutoff, HISTORY_COMPACT_BATCH),
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            placeholders = ','.join('?' for _ in ids)
+            cursor.execute(
+                f'''INSERT OR IGNORE INTO pwa_notifications_archive
+                        (id, monitor_id, type, title, options_json, scheduled_for, delivered_at, created_at, updated_at, dedupe_key, archived_at)
+                    SELECT id, monitor_id, type, title, options_json, scheduled_for, delivered_at, created_at, updated_at, dedupe_key, ?
+                    FROM pwa_notifications WHERE id IN ({placeholders})''',
+                [now.isoformat(), *ids],
+            )
+            cursor.execute(f'DELETE FROM pwa_notifications WHERE id IN ({placeholders})', ids)
+            conn.commit()
+            archived += len(ids)
+            if len(ids) < HISTORY_COMPACT_BATCH:
+                break
+    purged = 0
+    if retention_days > 0:
+        cutoff = (now - datetime.timedelta(days=retention_days)).isoformat()
+        while True:
+            cursor.execute(
+                '''DELETE FROM pwa_notifications_archive WHERE id IN (
+                       SELECT id FROM pwa_notifications_archive WHERE delivered_at < ?
+                       ORDER BY delivered_at LIMIT ?)''',
+                (cutoff, HISTORY_COMPACT_BATCH),
+            )
+            conn.commit()
+            purged += cursor.rowcount
+            if cursor.rowcount < HISTORY_COMPACT_BATCH:
+                break
+    return archived, purged
+
+
+def compact_history(force=False):
+    """Apply the retention limits every ``compact_interval`` seconds."""
+    global _last_compact
+    interval = _retention_settings['compact_interval']
+    now = time.monotonic()
+    with _compact_lock:
+        if not force and (interval <= 0 or (_last_compact is not None and now - _last_compact < interval)):
+            return None
+        _last_compact = now
+    conn = connSqlite()
+    try:
+        send_deleted = _compact_send_history(conn)
+        pwa_archived, pwa_purged = _compact_pwa_notifications(conn)
+    finally:
+        conn.close()
+    with _compact_lock:
+        _compact_stats['compactions'] += 1
+        _compact_stats['send_rows_deleted'] += send_deleted
+        _compact_stats['pwa_archived'] += pwa_archived
+        _compact_stats['pwa_purged'] += pwa_purged
+    return {'send_rows_deleted': send_deleted, 'pwa_archived': pwa_archived, 'pwa_purged': pwa_purged}
+
+
 def addSend(m_id, msg, flag):
     conn = connSqlite()
     exec = conn.cursor()
@@ -371,6 +960,9 @@ def queue_pwa_notification(monitor_id, notification_type, title, options, schedu
         if dedupe_key:
             cursor.execute('SELECT id, delivered_at FROM pwa_notifications WHERE dedupe_key=?', (dedupe_key,))
             existing = cursor.fetchone()
+            if existing is None:
+                cursor.execute('SELECT id, delivered_at FROM pwa_notifications_archive WHERE dedupe_key=?', (dedupe_key,))
+                existing = cursor.fetchone()
         if existing:
             if existing['delivered_at'] is None:
                 cursor.execute(
@@ -402,22 +994,61 @@ def queue_pwa_notification(monitor_id, notification_type, title, options, schedu
         conn.close()
 
 
-def fetch_pending_pwa_notifications(limit=20):
-    if limit is None or limit <= 0:
-        limit = 20
-    now_iso = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat()
-    conn = connSqlite()
-    try:
-        cursor = conn.cursor()
+def _select_claimable_pwa_notifications(cursor, now_iso, limit):
+    # two range scans of idx_pwa_notifications_due instead of one sort:
+    # scheduled rows in due order first, then unscheduled ones
+    cursor.execute(
+        '''SELECT id, monitor_id, type, title, options_json
+           FROM pwa_notifications
+           WHERE delivered_at IS NULL AND scheduled_for <= ?
+             AND (lease_expires_at IS NULL OR lease_expires_at <= ?)
+           ORDER BY scheduled_for, id
+           LIMIT ?''',
+        (now_iso, now_iso, limit),
+    )
+    rows = cursor.fetchall() or []
+    if len(rows) < limit:
         cursor.execute(
             '''SELECT id, monitor_id, type, title, options_json
                FROM pwa_notifications
-               WHERE delivered_at IS NULL AND (scheduled_for IS NULL OR scheduled_for <= ?)
-               ORDER BY CASE WHEN scheduled_for IS NULL THEN 1 ELSE 0 END, scheduled_for ASC, id ASC
+               WHERE delivered_at IS NULL AND scheduled_for IS NULL
+                 AND (lease_expires_at IS NULL OR lease_expires_at <= ?)
+               ORDER BY id
                LIMIT ?''',
-            (now_iso, limit),
+            (now_iso, limit - len(rows)),
         )
-        rows = cursor.fetchall() or []
+        rows.extend(cursor.fetchall() or [])
+    return rows
+
+
+def fetch_pending_pwa_notifications(limit=20, client_id=None, lease_seconds=PWA_LEASE_SECONDS):
+    """Claim up to ``limit`` due notifications for ``client_id``.
+
+    Claimed rows are leased for ``lease_seconds``: no other caller (nor the
+    same one) gets them again until the lease runs out, so a notification
+    that is never acknowledged is handed out again later. The write lock is
+    only taken once a plain read has found something to claim.
+    """
+    if limit is None or limit <= 0:
+        limit = 20
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    now_iso = now.isoformat()
+    lease_iso = (now + datetime.timedelta(seconds=lease_seconds)).isoformat()
+    conn = connSqlite()
+    try:
+        cursor = conn.cursor()
+        if not _select_claimable_pwa_notifications(cursor, now_iso, 1):
+            return []
+        cursor.execute('BEGIN IMMEDIATE')
+        # re-read under the lock: another caller may have leased them meanwhile
+        rows = _select_claimable_pwa_notifications(cursor, now_iso, limit)
+        if rows:
+            placeholders = ','.join('?' for _ in rows)
+            cursor.execute(
+                f'UPDATE pwa_notifications SET lease_owner=?, lease_expires_at=? WHERE id IN ({placeholders})',
+                [client_id, lease_iso, *(row['id'] for row in rows)],
+            )
+        conn.commit()
     finally:
         conn.close()
 
@@ -439,6 +1070,61 @@ def fetch_pending_pwa_notifications(limit=20):
     return notifications
 
 
+def pending_pwa_notification_ids(limit=500):
+    """Ids of undelivered notifications that are due now, oldest first."""
+    now_iso = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat()
+    conn = connSqlite()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''SELECT id FROM pwa_notifications
+               WHERE delivered_at IS NULL AND scheduled_for <= ?
+               ORDER BY scheduled_for, id LIMIT ?''',
+            (now_iso, limit),
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            '''SELECT id FROM pwa_notifications
+               WHERE delivered_at IS NULL AND scheduled_for IS NULL
+               ORDER BY id LIMIT ?''',
+            (limit,),
+        )
+        ids.extend(row[0] for row in cursor.fetchall())
+        return ids
+    finally:
+        conn.close()
+
+
+def seconds_until_next_pwa_notification():
+    """Seconds until a pending notification becomes due or its lease runs out."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    now_iso = now.isoformat()
+    conn = connSqlite()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''SELECT scheduled_for FROM pwa_notifications
+               WHERE delivered_at IS NULL AND scheduled_for > ?
+               ORDER BY scheduled_for LIMIT 1''',
+            (now_iso,),
+        )
+        candidates = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            '''SELECT MIN(lease_expires_at) FROM pwa_notifications
+               WHERE delivered_at IS NULL AND lease_expires_at > ?''',
+            (now_iso,),
+        )
+        candidates.extend(row[0] for row in cursor.fetchall() if row[0])
+    finally:
+        conn.close()
+    waits = []
+    for value in candidates:
+        moment = _parse_iso_datetime(value)
+        if moment is not None:
+            waits.append((moment - now).total_seconds())
+    return max(0.0, min(waits)) if waits else None
+
+
 def mark_pwa_notifications_delivered(ids):
     if not ids:
         return 0
@@ -456,7 +1142,7 @@ def mark_pwa_notifications_delivered(ids):
     try:
         cursor = conn.cursor()
         cursor.execute(
-            f'UPDATE pwa_notifications SET delivered_at=?, updated_at=? WHERE id IN ({placeholders})',
+            f'UPDATE pwa_notifications SET delivered_at=?, updated_at=? WHERE delivered_at IS NULL AND id IN ({placeholders})',
             [now_iso, now_iso, *clean_ids],
         )
         conn.commit()
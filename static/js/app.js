@@ -2,8 +2,12 @@ const STORAGE_KEY = 'renewal-monitor-cache';
 const REFRESH_INTERVAL = 20000;
 const FETCH_TIMEOUT = 15000;
 const NOTIFICATION_POLL_INTERVAL = 60 * 1000;
+const NOTIFICATION_LONG_POLL_SECONDS = 25;
+const NOTIFICATION_LONG_POLL_PAUSE = 1000;
+const NOTIFICATION_CLIENT_ID = `tab-${Math.random().toString(36).slice(2, 10)}`;
 const PWA_NOTIFICATION_ENDPOINT = '/notifications/pwa/pending';
 const PWA_NOTIFICATION_ACK_ENDPOINT = '/notifications/pwa/ack';
+const LIVE_EVENTS_ENDPOINT = '/events';
 const NOTIFICATION_SYNC_TAG = 'vps-expiry-sync';
 const FOCUSABLE_SELECTORS = 'a[href], area[href], input:not([disabled]):not([type="hidden"]), select:not([disabled]), textarea:not([disabled]), button:not([disabled]), [tabindex]:not([tabindex="-1"])';
 
@@ -35,10 +39,15 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
     const urlParams = new URLSearchParams(window.location.search);
     const state = {
         monitors: [],
+        rawMonitors: [],
+        selectEtag: null,
+        detailCache: new Map(),
         loading: false,
         offline: !navigator.onLine,
         refreshTimer: null,
         notificationTimer: null,
+        liveSource: null,
+        liveConnected: false,
         deferredPrompt: null,
         focusTargetId: urlParams.get('vps'),
     };
@@ -321,6 +330,7 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
         const normalized = Array.isArray(monitors)
             ? monitors.map(normalizeMonitor).filter((item) => item !== null)
             : [];
+        state.rawMonitors = Array.isArray(monitors) ? monitors : [];
         state.monitors = normalized;
         updateSummary(state.monitors);
         renderMonitors();
@@ -649,6 +659,7 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
             const parsed = JSON.parse(cached);
             if (parsed && Array.isArray(parsed.msg)) {
                 updateMonitors(parsed.msg);
+                state.selectEtag = parsed.etag || null;
                 return true;
             }
         } catch (error) {
@@ -666,18 +677,29 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
             controller.abort();
         }, FETCH_TIMEOUT);
         try {
+            const headers = { Accept: 'application/json' };
+            if (state.selectEtag) {
+                headers['If-None-Match'] = state.selectEtag;
+            }
             const response = await fetch('/select', {
-                headers: { Accept: 'application/json' },
+                headers,
+                cache: 'no-store',
                 signal: controller.signal,
             });
             window.clearTimeout(timeout);
-            if (!response.ok) {
-                throw new Error(`请求失败，状态码 ${response.status}`);
+            if (response.status === 304) {
+                // Unchanged on the server; re-render so time-relative labels stay current.
+                updateMonitors(state.rawMonitors);
+            } else {
+                if (!response.ok) {
+                    throw new Error(`请求失败，状态码 ${response.status}`);
+                }
+                const data = await response.json();
+                const monitors = Array.isArray(data?.msg) ? data.msg : [];
+                state.selectEtag = response.headers.get('ETag');
+                updateMonitors(monitors);
+                persistMonitors();
             }
-            const data = await response.json();
-            const monitors = Array.isArray(data?.msg) ? data.msg : [];
-            updateMonitors(monitors);
-            localStorage.setItem(STORAGE_KEY, JSON.stringify({ msg: monitors, updatedAt: Date.now() }));
             if (state.offline) {
                 state.offline = false;
                 hideBanner();
@@ -910,18 +932,32 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
                 return;
             }
 
-            const detailParams = new URLSearchParams();
-            detailParams.append('id', id);
-            const detailResponse = await fetch('/sel_id', {
-                method: 'POST',
-                body: detailParams,
+            const detailKey = String(id);
+            const cachedDetail = state.detailCache.get(detailKey);
+            const detailHeaders = { Accept: 'application/json' };
+            if (cachedDetail) {
+                detailHeaders['If-None-Match'] = cachedDetail.etag;
+            }
+            const detailResponse = await fetch(`/sel_id?id=${encodeURIComponent(detailKey)}`, {
+                headers: detailHeaders,
+                cache: 'no-store',
             });
 
             let detailPayload = null;
-            try {
-                detailPayload = await detailResponse.json();
-            } catch (parseError) {
-                detailPayload = null;
+            if (detailResponse.status === 304 && cachedDetail) {
+                detailPayload = cachedDetail.payload;
+            } else {
+                try {
+                    detailPayload = await detailResponse.json();
+                } catch (parseError) {
+                    detailPayload = null;
+                }
+                const detailEtag = detailResponse.headers.get('ETag');
+                if (detailResponse.ok && detailEtag && detailPayload) {
+                    state.detailCache.set(detailKey, { etag: detailEtag, payload: detailPayload });
+                } else {
+                    state.detailCache.delete(detailKey);
+                }
             }
 
             if (detailResponse.status === 404) {
@@ -938,7 +974,7 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
                 return;
             }
 
-            if (!detailResponse.ok) {
+            if (!detailResponse.ok && !(detailResponse.status === 304 && cachedDetail)) {
                 throw new Error(`监控信息加载失败，状态码 ${detailResponse.status}`);
             }
 
@@ -1013,6 +1049,88 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
         }
     }
 
+    function persistMonitors() {
+        localStorage.setItem(
+            STORAGE_KEY,
+            JSON.stringify({ msg: state.rawMonitors, etag: state.selectEtag, updatedAt: Date.now() })
+        );
+    }
+
+    function parseLiveEvent(event) {
+        try {
+            return JSON.parse(event.data);
+        } catch (error) {
+            console.warn('[frontend] Ignoring malformed live event:', error);
+            return null;
+        }
+    }
+
+    function applyLiveRows(transform) {
+        // Deltas move the data past the cached ETag; the next poll must fetch in full.
+        state.selectEtag = null;
+        updateMonitors(transform(state.rawMonitors.slice()));
+        persistMonitors();
+    }
+
+    function startLiveUpdates() {
+        if (!('EventSource' in window) || state.liveSource) {
+            return;
+        }
+        const source = new EventSource(LIVE_EVENTS_ENDPOINT);
+        state.liveSource = source;
+        source.addEventListener('open', () => {
+            state.liveConnected = true;
+        });
+        source.addEventListener('error', () => {
+            // Polling takes over while the browser reconnects (or for good once closed).
+            state.liveConnected = false;
+            if (source.readyState === EventSource.CLOSED) {
+                state.liveSource = null;
+            }
+        });
+        source.addEventListener('snapshot', (event) => {
+            const data = parseLiveEvent(event);
+            if (!data) {
+                return;
+            }
+            applyLiveRows(() => (Array.isArray(data.msg) ? data.msg : []));
+            fetchPendingNotifications({ force: true });
+        });
+        source.addEventListener('vps', (event) => {
+            const row = parseLiveEvent(event);
+            if (!Array.isArray(row)) {
+                return;
+            }
+            applyLiveRows((rows) => {
+                const index = rows.findIndex((item) => Array.isArray(item) && item[0] === row[0]);
+                if (index >= 0) {
+                    rows[index] = row;
+                } else {
+                    rows.push(row);
+                }
+                return rows;
+            });
+        });
+        source.addEventListener('vps-removed', (event) => {
+            const data = parseLiveEvent(event);
+            if (!data) {
+                return;
+            }
+            applyLiveRows((rows) => rows.filter((item) => !(Array.isArray(item) && item[0] === data.id)));
+        });
+        source.addEventListener('notification', () => {
+            fetchPendingNotifications({ force: true });
+        });
+    }
+
+    function stopLiveUpdates() {
+        if (state.liveSource) {
+            state.liveSource.close();
+            state.liveSource = null;
+        }
+        state.liveConnected = false;
+    }
+
     function handleOnline() {
         state.offline = false;
         hideBanner();
@@ -1141,19 +1259,23 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
             .catch(() => {});
     }
 
-    async function fetchPendingNotifications({ force = false } = {}) {
+    async function fetchPendingNotifications({ force = false, wait = 0 } = {}) {
         if (!notificationManager || typeof notificationManager.isEnabled !== 'function') {
-            return;
+            return false;
         }
         if (!notificationManager.isEnabled() || notificationManager.getPermission() !== 'granted') {
-            return;
+            return false;
         }
         const now = Date.now();
         if (!force && now - lastNotificationSyncAt < NOTIFICATION_POLL_INTERVAL) {
-            return;
+            return false;
+        }
+        const query = new URLSearchParams({ client: NOTIFICATION_CLIENT_ID });
+        if (wait > 0) {
+            query.set('wait', String(wait));
         }
         try {
-            const response = await fetch(PWA_NOTIFICATION_ENDPOINT, {
+            const response = await fetch(`${PWA_NOTIFICATION_ENDPOINT}?${query}`, {
                 headers: { Accept: 'application/json' },
                 cache: 'no-store',
                 credentials: 'same-origin',
@@ -1163,9 +1285,11 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
             }
             const payload = await response.json();
             const notifications = Array.isArray(payload?.notifications) ? payload.notifications : [];
+            // false when the server answered without holding the request (no long-poll slot free)
+            const waited = payload?.waited !== false;
             lastNotificationSyncAt = now;
             if (!notifications.length) {
-                return;
+                return waited;
             }
             const deliveredIds = [];
             for (const item of notifications) {
@@ -1199,20 +1323,34 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
                     body: JSON.stringify({ ids: deliveredIds }),
                 });
             }
+            return waited;
         } catch (error) {
             console.error('[notifications] Failed to fetch pending notifications:', error);
+            return false;
         }
     }
 
     function startNotificationPolling() {
         if (state.notificationTimer) {
-            window.clearInterval(state.notificationTimer);
+            window.clearTimeout(state.notificationTimer);
             state.notificationTimer = null;
         }
-        fetchPendingNotifications({ force: true });
-        state.notificationTimer = window.setInterval(() => {
-            fetchPendingNotifications();
-        }, NOTIFICATION_POLL_INTERVAL);
+        // Long-poll while /events is down; the server holds the request until a reminder is due.
+        // When it could not hold it (all long-poll slots busy), fall back to the regular interval.
+        const poll = async () => {
+            state.notificationTimer = null;
+            let delay = NOTIFICATION_POLL_INTERVAL;
+            if (!state.liveConnected) {
+                const waited = await fetchPendingNotifications({ force: true, wait: NOTIFICATION_LONG_POLL_SECONDS });
+                if (waited) {
+                    delay = NOTIFICATION_LONG_POLL_PAUSE;
+                }
+            }
+            state.notificationTimer = window.setTimeout(poll, delay);
+        };
+        fetchPendingNotifications({ force: true }).finally(() => {
+            state.notificationTimer = window.setTimeout(poll, NOTIFICATION_LONG_POLL_PAUSE);
+        });
     }
 
     function handleNotificationEnabledChange(isEnabled) {
@@ -1225,12 +1363,13 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
     }
 
     function cleanup() {
+        stopLiveUpdates();
         if (state.refreshTimer) {
             window.clearInterval(state.refreshTimer);
             state.refreshTimer = null;
         }
         if (state.notificationTimer) {
-            window.clearInterval(state.notificationTimer);
+            window.clearTimeout(state.notificationTimer);
             state.notificationTimer = null;
         }
         if (bannerTimeoutId) {
@@ -1247,8 +1386,14 @@ if (!ui.monitorList || !ui.formTemplate || !ui.modal || !ui.modalOverlay || !ui.
         }
         refreshData();
         state.refreshTimer = window.setInterval(() => {
-            refreshData({ silent: true });
+            if (state.liveConnected) {
+                // Data arrives over /events; only refresh the time-relative labels.
+                updateMonitors(state.rawMonitors);
+            } else {
+                refreshData({ silent: true });
+            }
         }, REFRESH_INTERVAL);
+        startLiveUpdates();
 
         ui.addButton?.addEventListener('click', openAddModal);
         ui.monitorList?.addEventListener('click', handleMonitorListClick);
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import logging
+import socket
+import threading
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, Optional
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer, make_server
+
+from bottle import ServerAdapter
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+SERVER_MODES = ('threaded', 'wsgiref')
+DEFAULT_SERVER_MODE = 'threaded'
+DEFAULT_WORKERS = 32
+DEFAULT_STREAM_WORKERS = 16
+DEFAULT_KEEPALIVE_TIMEOUT = 5
+DEFAULT_KEEPALIVE_REQUESTS = 100
+DEFAULT_REQUEST_TIMEOUT = 30
+KEEPALIVE_METHODS = ('GET', 'HEAD')
+# environ key under which the application finds the server's StreamSlots
+STREAM_SLOTS_ENVIRON = 'wsgi_server.stream_slots'
+
+
+def _to_int(raw, default: int, minimum: int = 0) -> int:
+    if raw is None or str(raw).strip() == '':
+        return default
+    try:
+        value = int(str(raw).strip())
+    except (TypeError, ValueError):
+        logger.warning('Ignoring invalid [server] value: %r', raw)
+        return default
+    return value if value >= minimum else default
+
+
+def read_settings(section: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Parse the ``[server]`` section of config.ini."""
+    section = section or {}
+    mode = str(section.get('mode') or DEFAULT_SERVER_MODE).strip().lower()
+    if mode not in SERVER_MODES:
+        logger.warning('Unknown [server] mode %r, using %s', mode, DEFAULT_SERVER_MODE)
+        mode = DEFAULT_SERVER_MODE
+    return {
+        'mode': mode,
+        'workers': _to_int(section.get('workers'), DEFAULT_WORKERS, minimum=1),
+        'stream_workers': _to_int(section.get('stream_workers'), DEFAULT_STREAM_WORKERS),
+        'keepalive_timeout': _to_int(section.get('keepalive_timeout'), DEFAULT_KEEPALIVE_TIMEOUT),
+        'keepalive_requests': _to_int(section.get('keepalive_requests'), DEFAULT_KEEPALIVE_REQUESTS),
+        'request_timeout': _to_int(section.get('request_timeout'), DEFAULT_REQUEST_TIMEOUT),
+        'debug': str(section.get('debug') or '0').strip().lower() in ('1', 'true', 'yes', 'on'),
+    }
+
+
+class StreamSlots:
+    """Counter capping how many long-lived responses may hold a worker at once.
+
+    ``/events`` and long-polls claim a slot for their lifetime and give up
+    streaming when none is left, so they can never occupy the workers that
+    regular requests rely on.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._active >= self.limit:
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = max(0, self._active - 1)
+
+    def active(self) -> int:
+        with self._lock:
+            return self._active
+
+
+class _KeepAliveServerHandler(ServerHandler):
+    http_version = '1.1'
+
+    def cleanup_headers(self):
+        super().cleanup_headers()
+        # without a length the body can only end with the connection
+        handler = self.request_handler
+        if (
+            handler.close_connection
+            or handler.requests_left <= 0
+            or 'Content-Length' not in self.headers
+            or handler.server.saturated()
+        ):
+            handler.close_connection = True
+            self.headers['Connection'] = 'close'
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """``WSGIRequestHandler`` that serves several GET/HEAD requests per connection.
+
+    The socket timeout is ``server.request_timeout`` while a request is read
+    or answered and ``server.keepalive_timeout`` while waiting for the next
+    one. Other methods close the connection, so a request body the
+    application did not read can never be parsed as the next request, and
+    so does every request while all workers are busy, so that idle
+    connections don't keep queued ones waiting.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def address_string(self):
+        return self.client_address[0]
+
+    def log_request(self, *args, **kwargs):
+        if not self.server.quiet:
+            super().log_request(*args, **kwargs)
+
+    def setup(self):
+        self.timeout = self.server.request_timeout or None
+        super().setup()
+
+    def get_environ(self):
+        environ = super().get_environ()
+        environ[STREAM_SLOTS_ENVIRON] = self.server.stream_slots
+        return environ
+
+    def handle(self):
+        self.close_connection = True
+        keepalive = self.server.keepalive_timeout > 0
+        self.requests_left = self.server.keepalive_requests - 1 if keepalive else 0
+        self._handle_request()
+        while not self.close_connection:
+            self.requests_left -= 1
+            self.connection.settimeout(self.server.keepalive_timeout)
+            try:
+                ready = self.rfile.peek(1)
+            except OSError:
+                return
+            if not ready:
+                return
+            self.connection.settimeout(self.server.request_timeout or None)
+            self._handle_request()
+
+    def _handle_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except OSError:
+            self.close_connection = True
+            return
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            self.close_connection = True
+            return
+        if not self.parse_request():
+            self.close_connection = True
+            return
+        if self.command not in KEEPALIVE_METHODS:
+            self.close_connection = True
+        handler = _KeepAliveServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+            multithread=True,
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+
+class ThreadedWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref server with one thread per connection and at most ``workers + stream_workers`` of them.
+
+    Connections past the limit wait in the listen backlog. Streaming
+    responses (``/events``, long-polls) hold a worker for their lifetime;
+    they must claim one of the ``stream_workers`` :class:`StreamSlots`
+    first, so at least ``workers`` threads stay free for regular requests
+    however many dashboards are open.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+    workers = DEFAULT_WORKERS
+    stream_workers = DEFAULT_STREAM_WORKERS
+    keepalive_timeout = DEFAULT_KEEPALIVE_TIMEOUT
+    keepalive_requests = DEFAULT_KEEPALIVE_REQUESTS
+    request_timeout = DEFAULT_REQUEST_TIMEOUT
+    quiet = False
+
+    def server_activate(self):
+        super().server_activate()
+        self.capacity = self.workers + self.stream_workers
+        self.stream_slots = StreamSlots(self.stream_workers)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._active_lock = threading.Lock()
+        self._active = 0
+
+    def saturated(self) -> bool:
+        with self._active_lock:
+            return self._active >= self.capacity
+
+    def _release_slot(self):
+        with self._active_lock:
+            self._active -= 1
+        self._slots.release()
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        with self._active_lock:
+            self._active += 1
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._release_slot()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._release_slot()
+
+
+def build_server(host: str, port: int, app, settings: Dict[str, Any], quiet: bool = False):
+    attributes = {
+        'workers': settings['workers'],
+        'stream_workers': settings['stream_workers'],
+        'keepalive_timeout': settings['keepalive_timeout'],
+        'keepalive_requests': settings['keepalive_requests'],
+        'request_timeout': settings['request_timeout'],
+        'quiet': quiet,
+    }
+    if ':' in host:
+        attributes['address_family'] = socket.AF_INET6
+    server_cls = type('ConfiguredWSGIServer', (ThreadedWSGIServer,), attributes)
+    return make_server(host, int(port), app, server_cls, KeepAliveRequestHandler)
+
+
+class ThreadedServerAdapter(ServerAdapter):
+    """Bottle adapter for :class:`ThreadedWSGIServer`; options come from :func:`read_settings`."""
+
+    def run(self, app):
+        settings = dict(read_settings())
+        settings.update(self.options)
+        server = build_server(self.host, self.port, app, settings, quiet=self.quiet)
+        logger.info(
+            'Serving on %s:%s with up to %s workers + %s streams (keep-alive %ss, request timeout %ss)',
+            self.host, self.port, settings['workers'], settings['stream_workers'],
+            settings['keepalive_timeout'], settings['request_timeout'],
+        )
+        server.serve_forever()